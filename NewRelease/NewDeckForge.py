@@ -121,9 +121,18 @@ class BuilderState(BaseModel):
     architecture: str = ""
     terraform_code: str = ""
 
+_llm_clients = {}
+_llm_lock = threading.Lock()
+
+def get_llm_client(json_mode=False):
+    # Reuse one client (and its keep-alive connection pool) per mode instead of one per call
+    with _llm_lock:
+        if json_mode not in _llm_clients:
+            _llm_clients[json_mode] = ChatOpenAI(model="gpt-4-turbo", temperature=0.1, model_kwargs={"response_format": {"type": "json_object"}} if json_mode else {})
+        return _llm_clients[json_mode]
+
 def llm_invoke(prompt, json_mode=False):
-    llm = ChatOpenAI(model="gpt-4-turbo", temperature=0.1, model_kwargs={"response_format": {"type": "json_object"}} if json_mode else {})
-    res = llm.invoke(prompt).content
+    res = get_llm_client(json_mode).invoke(prompt).content
     if json_mode:
         import re
         try: return json.loads(res)
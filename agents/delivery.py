@@ -1,11 +1,15 @@
 import os
 from git import Repo
 from github import Github
+from core.config import config
+from core.artifact_store import artifact_store
 
 def delivery_node(state):
-    if not state.git_config.enabled: return state
+    if not state.git_config.enabled: return {}
     token = os.getenv("GITHUB_TOKEN")
     path = f"exports/{state.current_blueprint.project_name}"
+    # git needs the whole working tree on disk
+    if config.export_store == "cas": artifact_store.materialize(state.current_blueprint.project_name, path)
     
     # Git Init & Push logic
     try:
@@ -16,4 +20,4 @@ def delivery_node(state):
         state.deployment_url = repo.html_url
     except:
         pass
-    return state
\ No newline at end of file
+    return {"deployment_url": state.deployment_url}
\ No newline at end of file
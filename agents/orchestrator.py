@@ -1,55 +1,238 @@
-from langgraph.graph import StateGraph, END
-from core.schema import AgentState, InfraBlueprint, ValidationResult
-from agents.vision import vision_node
+from langgraph.graph import StateGraph, START, END
+from core.schema import AgentState, InfraBlueprint
+from agents.vision import vision_node, avision_node
 from agents.delivery import delivery_node
 from core.llm_factory import get_llm
-from core.memory import memory
+from core.memory import memory, WARMING_POLICY
+from core.checkpoints import checkpoint_store
+from core.instrumentation import instrument_nodes
+from core.config import config
 from core.forge_engine import ForgeEngine
-from core.validator import CodeValidator
-import json, os
+from core.validator import VALIDATORS, validate_artifacts, avalidate_artifacts
+from core.artifact_store import artifact_store
+from utils.helpers import save_artifacts_to_disk
+import json, asyncio
 
-memory.initialize()
+if config.memory_warmup == "background": memory.warm()
+
+# Shared by every forge in the process so templates are loaded and compiled once
+renderer = ForgeEngine()
+if config.template_precompile: renderer.precompile()
 
 def context_node(state):
+    # Batches retrieve policy up front, once per distinct idea
+    if state.retrieved_policy: return {}
+    if not memory.ensure_ready(timeout=config.memory_wait_timeout):
+        return {"retrieved_policy": WARMING_POLICY}
     return {"retrieved_policy": memory.retrieve(state.user_idea)}
 
+def _strategist_prompt(state):
+    return f"Return JSON for this infra idea: {state.user_idea}. Standards: {state.retrieved_policy}"
+
 def strategist_node(state):
     llm = get_llm(json_mode=True)
-    res = llm.invoke(f"Return JSON for this infra idea: {state.user_idea}. Standards: {state.retrieved_policy}")
+    res = llm.invoke(_strategist_prompt(state))
     data = json.loads(res.content)
     return {"current_blueprint": InfraBlueprint(**data)}
 
+def _apply(state, result, changed=()):
+    """State update for one rendered stage; drops artifacts whose condition no longer holds."""
+    artifacts = {p: c for p, c in state.artifacts.items() if p not in result.removed}
+    artifacts.update(result.artifacts)
+    fingerprints = {p: f for p, f in state.artifact_fingerprints.items() if p not in result.removed}
+    fingerprints.update(result.fingerprints)
+    return {
+        "artifacts": artifacts,
+        "artifact_fingerprints": fingerprints,
+        "changed_artifacts": [*changed, *result.changed, *result.removed]
+    }
+
 def forge_node(state):
-    engine = ForgeEngine()
-    return engine.render(state)
+    return _apply(state, renderer.build("code", state))
+
+def _code_files(state):
+    code = renderer.stage_paths("code")
+    return {p: c for p, c in state.artifacts.items() if p in code}
+
+def _stale_tools(state, files):
+    """Validators with files but no result yet, or with a matching artifact changed since their last result."""
+    done = {r.tool for r in state.validation_results}
+    return {
+        v.tool for v in VALIDATORS
+        if any(map(v.matches, state.changed_artifacts)) or (v.tool not in done and any(map(v.matches, files)))
+    }
+
+def _merge_results(state, tools, results):
+    # Tools that re-ran (or lost their files) are replaced; the rest keep their earlier result
+    return [r for r in state.validation_results if r.tool not in tools] + results
+
+def export_path(project):
+    """Directory, relative to the working directory, that a project's artifacts are exported to."""
+    return f"exports/{project}"
+
+def _export(state, files, changed, materialize=None):
+    """
+    Persists artifacts and returns the project's export path. With the content-addressed
+    store only paths under `materialize` are written out as files.
+    """
+    project = state.current_blueprint.project_name
+    path = export_path(project)
+    if config.export_store == "cas":
+        artifact_store.update(project, files, changed)
+        if materialize is not None: artifact_store.materialize(project, path, materialize)
+    else:
+        save_artifacts_to_disk(files, path, changed)
+    return path
 
 def validator_node(state):
-    # Save files to disk for validator
-    path = f"exports/{state.current_blueprint.project_name}"
-    os.makedirs(path, exist_ok=True)
-    for p, c in state.artifacts.items():
-        fp = os.path.join(path, p)
-        os.makedirs(os.path.dirname(fp), exist_ok=True)
-        with open(fp, "w") as f: f.write(c)
-    
-    v = CodeValidator()
-    status, err = v.validate_terraform(path)
-    return {"validation_results": [ValidationResult(tool="Terraform", status=status, stderr=err)]}
-
-workflow = StateGraph(AgentState)
-workflow.add_node("vision", vision_node)
-workflow.add_node("context", context_node)
-workflow.add_node("strategist", strategist_node)
-workflow.add_node("forge", forge_node)
-workflow.add_node("validator", validator_node)
-workflow.add_node("delivery", delivery_node)
-
-workflow.set_entry_point("vision")
-workflow.add_edge("vision", "context")
-workflow.add_edge("context", "strategist")
-workflow.add_edge("strategist", "forge")
-workflow.add_edge("forge", "validator")
-workflow.add_edge("validator", "delivery")
-workflow.add_edge("delivery", END)
-
-brain = workflow.compile()
\ No newline at end of file
+    # Terraform needs its files on disk; the other validators read artifacts in memory
+    files = _code_files(state)
+    path = _export(state, files, state.changed_artifacts, materialize="terraform/")
+    tools = _stale_tools(state, files)
+    if not tools: return {}
+    return {"validation_results": _merge_results(state, tools, validate_artifacts(path, files, tools))}
+
+def _docs(state):
+    ctx = renderer.docs_context(state)
+    result = renderer.build("docs", state, ctx)
+    return result, {**_apply(state, result, state.changed_artifacts), "diagram_code": ctx["diagram_code"]}
+
+def docs_node(state):
+    result, update = _docs(state)
+    _export(state, result.artifacts, result.changed + result.removed)
+    return update
+
+# Async twins for the event-loop graph: LLM and terraform calls are awaited, while
+# blocking work (retrieval, rendering, exports, GitHub) moves to worker threads.
+async def acontext_node(state):
+    return await asyncio.to_thread(context_node, state)
+
+async def astrategist_node(state):
+    res = await get_llm(json_mode=True).ainvoke(_strategist_prompt(state))
+    data = json.loads(res.content)
+    return {"current_blueprint": InfraBlueprint(**data)}
+
+async def aforge_node(state):
+    return await asyncio.to_thread(forge_node, state)
+
+async def avalidator_node(state):
+    files = _code_files(state)
+    path = await asyncio.to_thread(_export, state, files, state.changed_artifacts, "terraform/")
+    tools = _stale_tools(state, files)
+    if not tools: return {}
+    return {"validation_results": _merge_results(state, tools, await avalidate_artifacts(path, files, tools))}
+
+async def adocs_node(state):
+    result, update = await asyncio.to_thread(_docs, state)
+    await asyncio.to_thread(_export, state, result.artifacts, result.changed + result.removed)
+    return update
+
+async def adelivery_node(state):
+    return await asyncio.to_thread(delivery_node, state)
+
+SYNC_NODES = {
+    "vision": vision_node, "context": context_node, "strategist": strategist_node, "forge": forge_node,
+    "validator": validator_node, "docs": docs_node, "delivery": delivery_node
+}
+ASYNC_NODES = {
+    "vision": avision_node, "context": acontext_node, "strategist": astrategist_node, "forge": aforge_node,
+    "validator": avalidator_node, "docs": adocs_node, "delivery": adelivery_node
+}
+
+def build_workflow(parallel=True, use_async=False, checkpoints=None):
+    """
+    parallel=True fans out independent work: vision and policy retrieval on the raw
+    idea run side by side and join at the strategist; validation and docs rendering
+    run side by side and join at delivery. parallel=False is the strict chain.
+    use_async=True builds the graph from the async nodes; drive it with ainvoke.
+    checkpoints (a CheckpointStore) records each node's output per thread_id and
+    replays it on later runs; call checkpoints.begin(state) before invoking.
+    Every node is instrumented; see core.instrumentation.
+    """
+    workflow = StateGraph(AgentState)
+    nodes = ASYNC_NODES if use_async else SYNC_NODES
+    if checkpoints: nodes = {name: checkpoints.wrap(name, node) for name, node in nodes.items()}
+    for name, node in instrument_nodes("forge", nodes).items():
+        workflow.add_node(name, node)
+
+    if parallel:
+        workflow.add_edge(START, "vision")
+        workflow.add_edge(START, "context")
+        workflow.add_edge(["vision", "context"], "strategist")
+        workflow.add_edge("strategist", "forge")
+        workflow.add_edge("forge", "validator")
+        workflow.add_edge("forge", "docs")
+        workflow.add_edge(["validator", "docs"], "delivery")
+    else:
+        workflow.set_entry_point("vision")
+        workflow.add_edge("vision", "context")
+        workflow.add_edge("context", "strategist")
+        workflow.add_edge("strategist", "forge")
+        workflow.add_edge("forge", "validator")
+        workflow.add_edge("validator", "docs")
+        workflow.add_edge("docs", "delivery")
+    workflow.add_edge("delivery", END)
+    return workflow.compile()
+
+brain = build_workflow(config.forge_parallel)
+abrain = build_workflow(config.forge_parallel, use_async=True)
+resumable_brain = build_workflow(config.forge_parallel, checkpoints=checkpoint_store)
+resumable_abrain = build_workflow(config.forge_parallel, use_async=True, checkpoints=checkpoint_store)
+
+def run_forge(state, checkpoints=None):
+    """
+    Runs the forge graph with per-node checkpoints for state.thread_id, which must be
+    unique per request. Rerunning the same request (e.g. a Celery retry after
+    validation failed) skips the nodes that already completed, including the vision
+    and strategist LLM calls. A run that reaches the end clears its checkpoints.
+    """
+    checkpoints = checkpoints or checkpoint_store
+    checkpoints.begin(state)
+    graph = resumable_brain if checkpoints is checkpoint_store else build_workflow(config.forge_parallel, checkpoints=checkpoints)
+    result = graph.invoke(state)
+    checkpoints.clear(state.thread_id)
+    return result
+
+async def aforge_many(states, concurrency=None, graph=None, on_done=None):
+    """
+    Runs many forges on one event loop, at most `concurrency` at a time. Results keep
+    the input order; a failed forge yields its exception instead of cancelling the rest.
+    on_done(index, result_or_exception) is called as each forge finishes.
+    """
+    slots = asyncio.Semaphore(concurrency or config.forge_concurrency)
+    graph = graph or abrain
+
+    async def one(i, state):
+        async with slots:
+            try:
+                result = await graph.ainvoke(state)
+            except Exception as e:
+                result = e
+        if on_done: on_done(i, result)
+        return result
+
+    return await asyncio.gather(*(one(i, s) for i, s in enumerate(states)))
+
+def _batch_policies(ideas):
+    if not memory.ensure_ready(timeout=config.memory_wait_timeout):
+        return dict.fromkeys(ideas, WARMING_POLICY)
+    return {idea: memory.retrieve(idea) for idea in ideas}
+
+async def aforge_batch(states, concurrency=None, on_done=None, checkpoints=None):
+    """
+    Forges a batch of ideas. Policy retrieval runs once per distinct idea before any
+    forge starts, templates are shared, and at most `concurrency` forges (so at most
+    that many strategist calls) are in flight. A failed item is reported as its
+    exception; nothing resumes it, so every item's checkpoints are cleared once the
+    batch finishes.
+    """
+    checkpoints = checkpoints or checkpoint_store
+    policies = await asyncio.to_thread(_batch_policies, {s.user_idea for s in states if not s.retrieved_policy})
+    states = [s if s.retrieved_policy else s.model_copy(update={"retrieved_policy": policies[s.user_idea]}) for s in states]
+    await asyncio.to_thread(lambda: [checkpoints.begin(s) for s in states])
+    graph = resumable_abrain if checkpoints is checkpoint_store else build_workflow(
+        config.forge_parallel, use_async=True, checkpoints=checkpoints
+    )
+    results = await aforge_many(states, concurrency or config.batch_concurrency, graph, on_done)
+    await asyncio.to_thread(lambda: [checkpoints.clear(s.thread_id) for s in states])
+    return results
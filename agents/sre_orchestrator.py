@@ -3,6 +3,7 @@ from core.schema import AgentState
 from agents.sre_investigator import investigate_node
 from core.llm_factory import get_llm
 from core.memory import memory
+from core.instrumentation import instrument_nodes
 import json
 
 def dispatcher_node(state):
@@ -80,11 +81,15 @@ def execution_planner_node(state):
 def create_sre_workflow():
     workflow = StateGraph(AgentState)
     
-    # Add nodes to the workflow
-    workflow.add_node("investigate", investigate_node)
-    workflow.add_node("dispatch", dispatcher_node)
-    workflow.add_node("approval_gate", approval_gate_node)
-    workflow.add_node("execution_planner", execution_planner_node)
+    # Add nodes to the workflow, each instrumented
+    nodes = instrument_nodes("sre", {
+        "investigate": investigate_node,
+        "dispatch": dispatcher_node,
+        "approval_gate": approval_gate_node,
+        "execution_planner": execution_planner_node
+    })
+    for name, node in nodes.items():
+        workflow.add_node(name, node)
     
     # Set entry point
     workflow.set_entry_point("investigate")
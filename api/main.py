@@ -1,8 +1,17 @@
-from fastapi import FastAPI, Depends, BackgroundTasks
+import uuid
+from contextlib import asynccontextmanager
+from typing import List
+from fastapi import FastAPI, Depends, BackgroundTasks, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse
 from sqlalchemy.orm import Session
 from core.database import engine, Base, get_db
 from core.models import Project
-from worker.tasks import forge_infrastructure, learn_from_feedback
+from core.memory import memory
+from core.llm_factory import pool_stats
+from core.instrumentation import histograms
+from core.validator import terraform_runner
+from core.config import config
+from worker.tasks import forge_infrastructure, forge_batch, learn_from_feedback
 from api.auth import get_current_user, require_architect
 from api.routes.alerts import router as alerts_router
 from api.slack_bot import router as slack_router
@@ -11,12 +20,42 @@ from pydantic import BaseModel
 # Create Tables
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    # Index the knowledge base in the background so /health/ready turns green without a forge
+    memory.warm()
+    yield
+
+app = FastAPI(lifespan=lifespan)
 
 # Include the new routes
 app.include_router(alerts_router)
 app.include_router(slack_router)
 
+@app.get("/health/live")
+def liveness():
+    return {"status": "ok"}
+
+@app.get("/health/ready")
+def readiness():
+    # Ready once the knowledge base index is hot; warming still serves forges with a fallback
+    status = memory.status()
+    return JSONResponse(status, status_code=200 if status["state"] == "ready" else 503)
+
+@app.get("/metrics/llm")
+def llm_metrics():
+    return pool_stats()
+
+@app.get("/metrics/subprocess")
+def subprocess_metrics():
+    return {"terraform": terraform_runner.metrics.snapshot()}
+
+@app.get("/metrics")
+def node_metrics():
+    # Prometheus text format; node series are populated when INSTRUMENTATION_SINKS includes "histogram"
+    text = histograms.prometheus() + terraform_runner.metrics.prometheus()
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
 class ForgeRequest(BaseModel):
     idea: str
     project_name: str
@@ -33,10 +72,41 @@ def trigger_forge(
     db.add(new_proj)
     db.commit()
 
-    # Trigger Phase 7 Worker
-    task = forge_infrastructure.delay(proj_id, req.idea, "thread-1")
+    # Trigger Phase 7 Worker; checkpoints are keyed by thread id, so each request gets its own
+    task = forge_infrastructure.delay(proj_id, req.idea, f"forge:{uuid.uuid4()}")
     return {"task_id": task.id, "status": "queued"}
 
+class BatchForgeRequest(BaseModel):
+    items: List[ForgeRequest]
+
+@app.post("/forge/batch")
+def trigger_forge_batch(
+    req: BatchForgeRequest,
+    user = Depends(require_architect),
+    db: Session = Depends(get_db)
+):
+    names = [item.project_name for item in req.items]
+    if not names or len(names) > config.batch_max_items:
+        raise HTTPException(status_code=422, detail=f"A batch takes 1 to {config.batch_max_items} items")
+    if len(set(names)) != len(names):
+        raise HTTPException(status_code=422, detail="Project names must be unique within a batch")
+
+    # One commit for the whole batch
+    db.add_all([Project(id=name, name=name, organization_id=user.organization_id) for name in names])
+    db.commit()
+
+    group_id = str(uuid.uuid4())
+    forge_batch.apply_async(args=[[{"project_id": i.project_name, "idea": i.idea} for i in req.items]], task_id=group_id)
+    return {"group_id": group_id, "total": len(names), "status": "queued"}
+
+@app.get("/forge/batch/{group_id}")
+def forge_batch_status(group_id: str, user = Depends(get_current_user)):
+    res = forge_batch.AsyncResult(group_id)
+    if res.state in ("PROGRESS", "SUCCESS"): info = res.info or {}
+    elif res.state == "FAILURE": info = {"error": str(res.info)}
+    else: info = {}
+    return {"group_id": group_id, "state": res.state, **info}
+
 @app.post("/feedback")
 def submit_feedback(
     original: str,
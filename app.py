@@ -46,10 +46,10 @@ if "final" in st.session_state:
             with st.expander(p): st.code(c)
     with t3:
         for v in res['validation_results']:
-            st.write(f"**{v.tool}**: {v.status}")
-            if v.stderr: st.error(v.stderr)
+            st.write(f"**{v.tool}**: {v.status} ({v.duration_s:.2f}s)")
+            if v.stderr: (st.error if v.status == "FAIL" else st.warning)(v.stderr)
     with t4:
         # Phase 5: Simulated State Parsing
-        parser = StateParser()
-        live = parser.parse_state(f"exports/{res['current_blueprint'].project_name}")
+        parser = StateParser(f"exports/{res['current_blueprint'].project_name}")
+        live = parser.get_live_resources()
         st.table(live)
\ No newline at end of file
@@ -0,0 +1,188 @@
+"""
+Offline throughput and tail-latency benchmark of the forge graph.
+
+Runs the forge graph against the fake LLM backend and the hashing embedder,
+so it needs no network or API key:
+
+    python bench_forge.py --runs 50 --concurrency 8 --latency 0.2 --jitter 0.1
+
+--compare runs the strict chain and the fanned-out graph back to back with one
+forge at a time, which isolates the critical-path latency of each shape.
+--retrieval-latency and --validate-latency stand in for the embedding round
+trip and the terraform subprocess, which are near-instant offline.
+--async drives the async graph from one event loop instead of a thread per forge:
+
+    python bench_forge.py --async --runs 200 --concurrency 50 --validate-latency 0.3
+"""
+import os
+import sys
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument("--runs", type=int, default=20)
+    p.add_argument("--concurrency", type=int, default=4)
+    p.add_argument("--latency", type=float, default=0.2, help="fake LLM base latency (s)")
+    p.add_argument("--jitter", type=float, default=0.0, help="extra uniform fake LLM latency (s)")
+    p.add_argument("--error-rate", type=float, default=0.0, help="fraction of fake LLM calls that fail")
+    p.add_argument("--retrieval-latency", type=float, default=0.0, help="simulated policy retrieval time (s)")
+    p.add_argument("--validate-latency", type=float, default=0.0, help="simulated terraform validate time (s)")
+    p.add_argument("--image", action="store_true", help="attach an image so the vision node calls the LLM")
+    p.add_argument("--graph", choices=["parallel", "sequential"], default="parallel")
+    p.add_argument("--async", dest="use_async", action="store_true", help="run the async graph on one event loop")
+    p.add_argument("--compare", action="store_true", help="benchmark sequential vs parallel at concurrency 1")
+    p.add_argument("--kb", default=os.path.join(REPO, "knowledge_base"), help="knowledge base to index")
+    return p.parse_args()
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def configure(args, workdir):
+    # Must happen before core.config is imported
+    os.environ.update({
+        "LLM_BACKEND": "fake",
+        "FAKE_LLM_LATENCY": str(args.latency),
+        "FAKE_LLM_JITTER": str(args.jitter),
+        "FAKE_LLM_ERROR_RATE": str(args.error_rate),
+        "EMBEDDING_BACKEND": "hashing",
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embeddings.sqlite"),
+        "CHROMA_PERSIST_DIR": os.path.join(workdir, "chroma"),
+        "KNOWLEDGE_BASE_PATH": args.kb,
+        "RETRIEVAL_CACHE_SIZE": "0",
+    })
+    # Nodes use repo-relative templates/ and write exports/, so run inside a scratch dir
+    os.symlink(os.path.join(REPO, "templates"), os.path.join(workdir, "templates"))
+    os.chdir(workdir)
+    sys.path.insert(0, REPO)
+
+
+def simulate_latency(args):
+    from core.memory import memory
+    from core.validator import CodeValidator
+
+    if args.retrieval_latency:
+        retrieve = memory.retrieve
+        def slow_retrieve(*a, **kw):
+            time.sleep(args.retrieval_latency)
+            return retrieve(*a, **kw)
+        memory.retrieve = slow_retrieve
+    if args.validate_latency:
+        validate = CodeValidator.validate_terraform
+        def slow_validate(self, *a, **kw):
+            time.sleep(args.validate_latency)
+            return validate(self, *a, **kw)
+        CodeValidator.validate_terraform = slow_validate
+        avalidate = CodeValidator.avalidate_terraform
+        async def slow_avalidate(self, *a, **kw):
+            await asyncio.sleep(args.validate_latency)
+            return await avalidate(self, *a, **kw)
+        CodeValidator.avalidate_terraform = slow_avalidate
+
+
+def make_state(args, i):
+    from core.schema import AgentState
+    image = "aGVsbG8=" if args.image else None
+    return AgentState(thread_id=f"bench-{i}", user_idea=f"Web app {i} with a Postgres database", image_data=image)
+
+
+def summarize(results, wall):
+    latencies = [t for t, e in results if e is None]
+    return {
+        "wall": wall,
+        "errors": sum(1 for _, e in results if e is not None),
+        "throughput": len(latencies) / wall,
+        "latencies": latencies,
+    }
+
+
+def run_benchmark(graph, args, runs, concurrency):
+    def run(i):
+        state = make_state(args, i)
+        started = time.perf_counter()
+        try:
+            graph.invoke(state)
+            return time.perf_counter() - started, None
+        except Exception as e:
+            return time.perf_counter() - started, e
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(run, range(runs)))
+    return summarize(results, time.perf_counter() - started)
+
+
+def run_benchmark_async(graph, args, runs, concurrency):
+    async def main():
+        slots = asyncio.Semaphore(concurrency)
+
+        async def run(i):
+            async with slots:
+                started = time.perf_counter()
+                try:
+                    await graph.ainvoke(make_state(args, i))
+                    return time.perf_counter() - started, None
+                except Exception as e:
+                    return time.perf_counter() - started, e
+
+        return await asyncio.gather(*(run(i) for i in range(runs)))
+
+    started = time.perf_counter()
+    results = asyncio.run(main())
+    return summarize(results, time.perf_counter() - started)
+
+
+def report(label, result):
+    lat = result["latencies"]
+    print(f"[{label}] throughput: {result['throughput']:.2f} forges/s  wall: {result['wall']:.2f}s  errors: {result['errors']}")
+    if lat:
+        print(
+            f"[{label}] latency: mean={statistics.mean(lat):.3f}s p50={percentile(lat, 50):.3f}s "
+            f"p95={percentile(lat, 95):.3f}s p99={percentile(lat, 99):.3f}s max={max(lat):.3f}s"
+        )
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix="deckforge-bench-")
+    try:
+        configure(args, workdir)
+        from core.memory import memory
+        from agents.orchestrator import build_workflow
+
+        memory.ensure_ready()
+        simulate_latency(args)
+        print(
+            f"runs={args.runs} concurrency={args.concurrency} fake_latency={args.latency}s jitter={args.jitter}s "
+            f"retrieval={args.retrieval_latency}s validate={args.validate_latency}s image={args.image} async={args.use_async}"
+        )
+        bench = run_benchmark_async if args.use_async else run_benchmark
+        if args.compare:
+            # One forge at a time: per-run latency is the graph's critical path
+            before = bench(build_workflow(parallel=False, use_async=args.use_async), args, args.runs, 1)
+            after = bench(build_workflow(parallel=True, use_async=args.use_async), args, args.runs, 1)
+            report("sequential", before)
+            report("parallel", after)
+            if before["latencies"] and after["latencies"]:
+                saved = statistics.mean(before["latencies"]) - statistics.mean(after["latencies"])
+                print(f"critical path: -{saved:.3f}s per forge ({saved / statistics.mean(before['latencies']):.0%})")
+        else:
+            graph = build_workflow(parallel=args.graph == "parallel", use_async=args.use_async)
+            report(args.graph, bench(graph, args, args.runs, args.concurrency))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
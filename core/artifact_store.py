@@ -0,0 +1,140 @@
+import os, json, time, zlib, fcntl, hashlib, threading
+from typing import Dict, Iterable, Optional
+from core.config import config
+
+def _atomic_write(path, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+class ArtifactStore:
+    """
+    Content-addressed export store. Every artifact is a zlib-compressed blob named by
+    the sha256 of its content, so identical files across thousands of projects are
+    stored once; a per-project manifest maps artifact paths to blobs. Files reach a
+    working tree only through materialize(), when terraform or git needs them.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or config.artifact_store_path
+
+    def _blob_path(self, digest):
+        return os.path.join(self.root, "blobs", digest[:2], digest[2:])
+
+    def _manifest_path(self, project):
+        return os.path.join(self.root, "projects", f"{project}.json")
+
+    def _record_path(self, dest):
+        # What was materialized where; kept in the store so working trees stay clean for git
+        key = hashlib.sha1(os.path.abspath(dest).encode()).hexdigest()
+        return os.path.join(self.root, "materialized", f"{key}.json")
+
+    def put(self, content: str) -> str:
+        data = content.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        try:
+            # Refresh the mtime so gc() leaves it alone until the manifest referencing it is written
+            os.utime(path)
+        except FileNotFoundError:
+            _atomic_write(path, zlib.compress(data))
+        return digest
+
+    def get(self, digest: str) -> str:
+        with open(self._blob_path(digest), "rb") as f:
+            return zlib.decompress(f.read()).decode("utf-8")
+
+    def manifest(self, project: str) -> Dict[str, str]:
+        try:
+            with open(self._manifest_path(project)) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def update(self, project: str, artifacts: Dict[str, str], changed: Optional[Iterable[str]] = None) -> Dict[str, str]:
+        """
+        Stores `artifacts` under the project's manifest, keeping entries it does not
+        mention. Paths in `changed` that are missing from `artifacts` are dropped.
+        """
+        digests = {path: self.put(content) for path, content in artifacts.items()}
+        removed = set(changed or ()) - set(artifacts)
+        path = self._manifest_path(project)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Celery runs several processes; serialize the read-modify-write per project across all of them
+        with open(f"{path[:-5]}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            manifest = {p: d for p, d in self.manifest(project).items() if p not in removed}
+            manifest.update(digests)
+            _atomic_write(path, json.dumps(manifest, sort_keys=True, indent=2).encode())
+        return manifest
+
+    def load(self, project: str) -> Dict[str, str]:
+        return {path: self.get(digest) for path, digest in self.manifest(project).items()}
+
+    def materialize(self, project: str, dest: str, prefix: str = "") -> int:
+        """
+        Writes the project's artifacts under `prefix` into `dest`, skipping files that
+        already hold the right blob and deleting ones it materialized earlier that left
+        the manifest. Files it did not write (e.g. .terraform/) are never touched.
+        Returns the number of files written.
+        """
+        wanted = {p: d for p, d in self.manifest(project).items() if p.startswith(prefix)}
+        record_path = self._record_path(dest)
+        try:
+            with open(record_path) as f:
+                record = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            record = {}
+
+        written = 0
+        for path, digest in wanted.items():
+            target = os.path.join(dest, path)
+            if record.get(path) == digest and os.path.exists(target): continue
+            _atomic_write(target, self.get(digest).encode("utf-8"))
+            record[path] = digest
+            written += 1
+        for path in [p for p in record if p.startswith(prefix) and p not in wanted]:
+            target = os.path.join(dest, path)
+            if os.path.exists(target): os.remove(target)
+            del record[path]
+        _atomic_write(record_path, json.dumps(record, sort_keys=True).encode())
+        return written
+
+    def gc(self, grace: Optional[float] = None) -> int:
+        """
+        Deletes blobs no project manifest references and nobody stored or reused in the
+        last `grace` seconds (default ARTIFACT_GC_GRACE), so exports still writing
+        their manifest keep their blobs. Returns how many were removed.
+        """
+        grace = config.artifact_gc_grace if grace is None else grace
+        cutoff = time.time() - grace
+        projects = os.path.join(self.root, "projects")
+        live = set()
+        if os.path.isdir(projects):
+            for name in os.listdir(projects):
+                if name.endswith(".json"): live.update(self.manifest(name[:-5]).values())
+        removed = 0
+        blobs = os.path.join(self.root, "blobs")
+        for shard in os.listdir(blobs) if os.path.isdir(blobs) else []:
+            for rest in os.listdir(os.path.join(blobs, shard)):
+                path = os.path.join(blobs, shard, rest)
+                if shard + rest in live or rest.endswith(".tmp"): continue
+                try:
+                    if os.path.getmtime(path) >= cutoff: continue
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                removed += 1
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        blobs, stored = 0, 0
+        for dirpath, _, files in os.walk(os.path.join(self.root, "blobs")):
+            for name in files:
+                blobs += 1
+                stored += os.path.getsize(os.path.join(dirpath, name))
+        return {"blobs": blobs, "stored_bytes": stored}
+
+artifact_store = ArtifactStore()
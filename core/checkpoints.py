@@ -0,0 +1,138 @@
+import os, json, time, asyncio, hashlib, threading
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy import create_engine, MetaData, Table, Column, String, Text, Float, select, delete
+from sqlalchemy.pool import StaticPool
+from core.config import config
+from core.schema import AgentState
+
+metadata = MetaData()
+
+forge_runs = Table(
+    "forge_runs", metadata,
+    Column("thread_id", String, primary_key=True),
+    Column("input_digest", String, nullable=False),
+    Column("started_at", Float, nullable=False)
+)
+
+forge_checkpoints = Table(
+    "forge_checkpoints", metadata,
+    Column("thread_id", String, primary_key=True),
+    Column("node", String, primary_key=True),
+    Column("output", Text, nullable=False),
+    Column("created_at", Float, nullable=False)
+)
+
+_any = TypeAdapter(Any)
+
+@lru_cache(maxsize=None)
+def _field_adapter(schema, key):
+    return TypeAdapter(schema.model_fields[key].annotation)
+
+def input_digest(state: AgentState) -> str:
+    """Fingerprint of what the caller asked for; thread_id excluded."""
+    return hashlib.sha256(state.model_dump_json(exclude={"thread_id"}).encode()).hexdigest()
+
+class CheckpointStore:
+    """
+    Durable per-node outputs of forge runs, keyed by (thread_id, node). Backed by any
+    SQLAlchemy URL: the app's Postgres in production, a local SQLite file otherwise.
+    A retried run replays stored outputs instead of calling the node again.
+    """
+
+    def __init__(self, url=None, schema=AgentState, ttl=None):
+        self.url = url or config.checkpoint_url
+        self.schema = schema
+        self.ttl = config.checkpoint_ttl if ttl is None else ttl
+        self._engine = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _db(self):
+        # Pooled connections must not cross a fork (Celery prefork children)
+        with self._lock:
+            if self._engine is None or self._pid != os.getpid():
+                kwargs = {}
+                if self.url.startswith("sqlite"):
+                    path = self.url.split(":///", 1)[-1] if ":///" in self.url else ""
+                    if path and os.path.dirname(path): os.makedirs(os.path.dirname(path), exist_ok=True)
+                    kwargs["connect_args"] = {"check_same_thread": False}
+                    if not path or path == ":memory:": kwargs["poolclass"] = StaticPool
+                self._engine = create_engine(self.url, **kwargs)
+                metadata.create_all(self._engine)
+                self._pid = os.getpid()
+            return self._engine
+
+    def dump(self, output) -> str:
+        # Nodes may return the whole state object instead of a partial dict
+        if isinstance(output, BaseModel): output = {k: getattr(output, k) for k in type(output).model_fields}
+        return json.dumps(_any.dump_python(output, mode="json"))
+
+    def restore(self, raw: str) -> Dict[str, Any]:
+        return {k: _field_adapter(self.schema, k).validate_python(v) for k, v in json.loads(raw).items()}
+
+    def begin(self, state: AgentState) -> List[str]:
+        """
+        Registers a run for state.thread_id and returns the nodes it has already completed.
+        Checkpoints left by a different request under the same thread_id are discarded.
+        """
+        digest, now = input_digest(state), time.time()
+        with self._db().begin() as conn:
+            if self.ttl:
+                expired = select(forge_runs.c.thread_id).where(forge_runs.c.started_at < now - self.ttl)
+                conn.execute(delete(forge_checkpoints).where(forge_checkpoints.c.thread_id.in_(expired)))
+                conn.execute(delete(forge_runs).where(forge_runs.c.started_at < now - self.ttl))
+            row = conn.execute(select(forge_runs.c.input_digest).where(forge_runs.c.thread_id == state.thread_id)).first()
+            if row is None or row[0] != digest:
+                conn.execute(delete(forge_checkpoints).where(forge_checkpoints.c.thread_id == state.thread_id))
+                conn.execute(delete(forge_runs).where(forge_runs.c.thread_id == state.thread_id))
+                conn.execute(forge_runs.insert().values(thread_id=state.thread_id, input_digest=digest, started_at=now))
+                return []
+        return self.completed(state.thread_id)
+
+    def completed(self, thread_id: str) -> List[str]:
+        with self._db().connect() as conn:
+            rows = conn.execute(select(forge_checkpoints.c.node).where(forge_checkpoints.c.thread_id == thread_id))
+            return sorted(r[0] for r in rows)
+
+    def load(self, thread_id: str, node: str) -> Optional[Dict[str, Any]]:
+        with self._db().connect() as conn:
+            row = conn.execute(select(forge_checkpoints.c.output).where(
+                forge_checkpoints.c.thread_id == thread_id, forge_checkpoints.c.node == node
+            )).first()
+        return self.restore(row[0]) if row else None
+
+    def save(self, thread_id: str, node: str, output) -> None:
+        raw = self.dump(output)
+        with self._db().begin() as conn:
+            conn.execute(delete(forge_checkpoints).where(
+                forge_checkpoints.c.thread_id == thread_id, forge_checkpoints.c.node == node
+            ))
+            conn.execute(forge_checkpoints.insert().values(thread_id=thread_id, node=node, output=raw, created_at=time.time()))
+
+    def clear(self, thread_id: str) -> None:
+        with self._db().begin() as conn:
+            conn.execute(delete(forge_checkpoints).where(forge_checkpoints.c.thread_id == thread_id))
+            conn.execute(delete(forge_runs).where(forge_runs.c.thread_id == thread_id))
+
+    def wrap(self, name, node):
+        """Returns `node` with its output replayed from, or recorded to, this store."""
+        if asyncio.iscoroutinefunction(node):
+            async def run(state):
+                stored = await asyncio.to_thread(self.load, state.thread_id, name)
+                if stored is not None: return stored
+                output = await node(state)
+                await asyncio.to_thread(self.save, state.thread_id, name, output)
+                return output
+        else:
+            def run(state):
+                stored = self.load(state.thread_id, name)
+                if stored is not None: return stored
+                output = node(state)
+                self.save(state.thread_id, name, output)
+                return output
+        run.__name__ = getattr(node, "__name__", name)
+        return run
+
+checkpoint_store = CheckpointStore()
@@ -17,18 +17,104 @@ class DeckForgeConfig:
     # Paths
     knowledge_base_path: str = os.getenv("KNOWLEDGE_BASE_PATH", "knowledge_base")
     exports_path: str = os.getenv("EXPORTS_PATH", "exports")
+    # Exports: "cas" keeps deduplicated compressed blobs and writes files only for terraform/git; "files" writes every artifact
+    export_store: str = os.getenv("EXPORT_STORE", "cas")
+    artifact_store_path: str = os.getenv("ARTIFACT_STORE_PATH", "exports/.store")
+    # gc() keeps unreferenced blobs written or reused this recently (seconds): an export may not have saved its manifest yet
+    artifact_gc_grace: float = float(os.getenv("ARTIFACT_GC_GRACE", "3600"))
     templates_path: str = os.getenv("TEMPLATES_PATH", "templates")
+    # Compiled template bytecode shared across processes ("" disables); reload on template mtime change
+    template_cache_dir: str = os.getenv("TEMPLATE_CACHE_DIR", "./storage/jinja_cache")
+    template_auto_reload: bool = os.getenv("TEMPLATE_AUTO_RELOAD", "True").lower() == "true"
+    template_precompile: bool = os.getenv("TEMPLATE_PRECOMPILE", "True").lower() == "true"
+    # Artifact manifest (defaults to <templates>/manifest.yml) and threads rendering its templates (1 = sequential)
+    artifact_manifest: str = os.getenv("ARTIFACT_MANIFEST", "")
+    render_workers: int = int(os.getenv("RENDER_WORKERS", "1"))
     
     # LLM Settings
     llm_model: str = os.getenv("LLM_MODEL", "gpt-4-turbo")
     llm_temperature: float = float(os.getenv("LLM_TEMPERATURE", "0"))
+    # openai | fake (deterministic offline stub for load tests and CI)
+    llm_backend: str = os.getenv("LLM_BACKEND", "openai")
+    fake_llm_latency: float = float(os.getenv("FAKE_LLM_LATENCY", "0"))
+    fake_llm_jitter: float = float(os.getenv("FAKE_LLM_JITTER", "0"))
+    fake_llm_error_rate: float = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+    fake_llm_seed: int = int(os.getenv("FAKE_LLM_SEED", "0"))
+    # Shared HTTP pool: max concurrent in-flight LLM requests per process, request timeout (s)
+    llm_max_in_flight: int = int(os.getenv("LLM_MAX_IN_FLIGHT", "16"))
+    llm_timeout: float = float(os.getenv("LLM_TIMEOUT", "120"))
+    # Opt-in response cache for temperature=0 calls: memory LRU + sqlite | redis | memory tier
+    llm_cache: bool = os.getenv("LLM_CACHE", "False").lower() == "true"
+    llm_cache_backend: str = os.getenv("LLM_CACHE_BACKEND", "sqlite")
+    llm_cache_path: str = os.getenv("LLM_CACHE_PATH", "./storage/llm_cache.sqlite")
+    llm_cache_redis_url: str = os.getenv("LLM_CACHE_REDIS_URL", os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    llm_cache_size: int = int(os.getenv("LLM_CACHE_SIZE", "512"))
+    llm_cache_ttl: float = float(os.getenv("LLM_CACHE_TTL", "86400"))
     
     # Vector Database Settings
     chroma_persist_dir: str = os.getenv("CHROMA_PERSIST_DIR", "./storage/chroma_db")
     embedding_model: str = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
+    # openai | local (sentence-transformers on CPU) | hashing (deterministic, offline)
+    embedding_backend: str = os.getenv("EMBEDDING_BACKEND", "openai")
+    local_embedding_model: str = os.getenv("LOCAL_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    embedding_cache_path: str = os.getenv("EMBEDDING_CACHE_PATH", "./storage/embedding_cache.sqlite")
+    embedding_cache_max_entries: int = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+    # Poll the knowledge base and hot-apply added/changed/removed files
+    memory_watch: bool = os.getenv("MEMORY_WATCH", "False").lower() == "true"
+    memory_watch_interval: float = float(os.getenv("MEMORY_WATCH_INTERVAL", "5"))
+    # Knowledge base ingest: parser processes (0 = one per CPU) and chunks per embedding batch
+    ingest_workers: int = int(os.getenv("INGEST_WORKERS", "0"))
+    ingest_batch_size: int = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+    # vector | lexical (BM25 only, no embedding call) | hybrid (rank fusion of both)
+    retrieval_mode: str = os.getenv("RETRIEVAL_MODE", "hybrid")
+    retrieval_cache_size: int = int(os.getenv("RETRIEVAL_CACHE_SIZE", "256"))
+    retrieval_cache_ttl: float = float(os.getenv("RETRIEVAL_CACHE_TTL", "600"))
+    # "lazy" indexes on first retrieval, "background" starts indexing at import
+    memory_warmup: str = os.getenv("MEMORY_WARMUP", "lazy")
+    # Seconds context_node waits for a warming index before falling back (unset = wait)
+    memory_wait_timeout: Optional[float] = float(os.getenv("MEMORY_WAIT_TIMEOUT")) if os.getenv("MEMORY_WAIT_TIMEOUT") else None
+    
+    # Orchestrator Settings: run independent forge nodes (vision/context, validator/docs) concurrently
+    forge_parallel: bool = os.getenv("FORGE_PARALLEL", "True").lower() == "true"
+    # Max forges one process drives at once on the async graph (aforge_many)
+    forge_concurrency: int = int(os.getenv("FORGE_CONCURRENCY", "32"))
+    # Batch forge API: max ideas per request and forges (strategist calls) in flight per batch
+    batch_max_items: int = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+    batch_concurrency: int = int(os.getenv("BATCH_CONCURRENCY", "8"))
+    # Per-node forge checkpoints: SQLAlchemy URL (defaults to DATABASE_URL, else local SQLite) and retention
+    checkpoint_url: str = os.getenv("CHECKPOINT_DATABASE_URL") or os.getenv("DATABASE_URL") or "sqlite:///./storage/checkpoints.sqlite"
+    checkpoint_ttl: int = int(os.getenv("CHECKPOINT_TTL", str(7 * 86400)))
+    
+    # Per-node instrumentation of the graphs and where metrics go (log, histogram, or registered sinks)
+    instrumentation: bool = os.getenv("INSTRUMENTATION", "True").lower() == "true"
+    instrumentation_sinks: tuple = tuple(s.strip() for s in os.getenv("INSTRUMENTATION_SINKS", "histogram").split(",") if s.strip())
     
     # Terraform Settings
     terraform_binary: str = os.getenv("TERRAFORM_BINARY", "terraform")
+    # In-process HCL syntax and reference check; terraform only runs when it passes
+    terraform_precheck: bool = os.getenv("TERRAFORM_PRECHECK", "True").lower() == "true"
+    # Shared provider plugin cache and pre-initialized provider workspaces for validation
+    terraform_workspace_dir: str = os.getenv("TERRAFORM_WORKSPACE_DIR", "./storage/terraform")
+    # Seconds before a shared workspace whose init failed is initialized again
+    terraform_workspace_retry_after: float = float(os.getenv("TERRAFORM_WORKSPACE_RETRY_AFTER", "300"))
+    # Validation results keyed by terraform content + provider lock hash: sqlite | redis
+    validation_cache: bool = os.getenv("VALIDATION_CACHE", "True").lower() == "true"
+    validation_cache_backend: str = os.getenv("VALIDATION_CACHE_BACKEND", "sqlite")
+    validation_cache_path: str = os.getenv("VALIDATION_CACHE_PATH", "./storage/validation_cache.sqlite")
+    validation_cache_redis_url: str = os.getenv("VALIDATION_CACHE_REDIS_URL", os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    validation_cache_ttl: float = float(os.getenv("VALIDATION_CACHE_TTL", str(7 * 86400)))
+    # Validators run concurrently on this many threads, each within its own wall-clock budget (seconds)
+    validation_workers: int = int(os.getenv("VALIDATION_WORKERS", "4"))
+    validation_timeout: float = float(os.getenv("VALIDATION_TIMEOUT", "30"))
+    terraform_timeout: float = float(os.getenv("TERRAFORM_TIMEOUT", "300"))
+    # The terraform validator may run workspace init, init and validate, each up to TERRAFORM_TIMEOUT
+    terraform_validation_timeout: float = float(os.getenv("TERRAFORM_VALIDATION_TIMEOUT") or 3 * terraform_timeout)
+    # terraform processes per worker process, and per-process CPU seconds / address space MiB (0 = unlimited)
+    terraform_max_concurrent: int = int(os.getenv("TERRAFORM_MAX_CONCURRENT", "4"))
+    terraform_cpu_limit: int = int(os.getenv("TERRAFORM_CPU_LIMIT", "600"))
+    terraform_memory_limit_mb: int = int(os.getenv("TERRAFORM_MEMORY_LIMIT_MB", "0"))
+    # State file read for drift checks, e.g. /mnt/tfstate/{project}.tfstate; empty uses the project's local backend
+    terraform_state_path: str = os.getenv("TERRAFORM_STATE_PATH", "")
     
     def validate(self) -> None:
         """Validate the configuration."""
@@ -44,4 +130,7 @@ class DeckForgeConfig:
             errors.append(f"Knowledge base path does not exist: {self.knowledge_base_path}")
             
         if errors:
-            raise ValueError("Configuration validation failed: " + "; ".join(errors))
\ No newline at end of file
+            raise ValueError("Configuration validation failed: " + "; ".join(errors))
+
+
+config = DeckForgeConfig()
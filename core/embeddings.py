@@ -0,0 +1,154 @@
+import os, re, math, time, array, sqlite3, hashlib, threading
+from typing import Callable, Dict, List
+from langchain_core.embeddings import Embeddings
+from core.config import config
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic feature-hashing embedder. No model, no network: tokens and
+    token bigrams are hashed into a fixed-size signed vector. Good enough for
+    CI, air-gapped installs and benchmarks where ranking quality is secondary.
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self.model_id = f"hashing-{dim}"
+
+    def _embed(self, text: str) -> List[float]:
+        vec = [0.0] * self.dim
+        tokens = re.findall(r"\w+", text.lower())
+        for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+            h = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "big")
+            vec[h % self.dim] += 1.0 if (h >> 63) else -1.0
+        norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+        return [v / norm for v in vec]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+class CachedEmbeddings(Embeddings):
+    """
+    Disk-backed LRU cache in front of any embedder, keyed by model id plus the
+    sha256 of the chunk text. Identical boilerplate across documents (and
+    re-indexing after a manifest reset) is embedded once.
+    """
+
+    def __init__(self, embedder: Embeddings, model_id: str, path: str, max_entries: int = 200_000):
+        self.embedder = embedder
+        self.model_id = model_id
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+
+    def _db(self):
+        if self._conn is None or self._conn_pid != os.getpid():
+            if os.path.dirname(self.path): os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB, last_used REAL)"
+            )
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def _key(self, text: str) -> str:
+        return f"{self.model_id}:{hashlib.sha256(text.encode()).hexdigest()}"
+
+    def _get_many(self, keys):
+        found = {}
+        with self._lock:
+            db = self._db()
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                rows = db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                found.update((k, array.array("f", v).tolist()) for k, v in rows)
+            if found:
+                now = time.time()
+                db.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+                db.commit()
+        return found
+
+    def _put_many(self, items):
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(k, array.array("f", v).tobytes(), now) for k, v in items]
+            )
+            overflow = db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                db.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)", (overflow,)
+                )
+            db.commit()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(t) for t in texts]
+        cached = self._get_many(list(set(keys)))
+        missing = {}
+        for k, t in zip(keys, texts):
+            if k not in cached: missing.setdefault(k, t)
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            vectors = self.embedder.embed_documents(list(missing.values()))
+            fresh = list(zip(missing.keys(), vectors))
+            self._put_many(fresh)
+            cached.update(fresh)
+        return [cached[k] for k in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        cached = self._get_many([key])
+        if key in cached:
+            self.hits += 1
+            return cached[key]
+        self.misses += 1
+        vec = self.embedder.embed_query(text)
+        self._put_many([(key, vec)])
+        return vec
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+def _openai():
+    from langchain_openai import OpenAIEmbeddings
+    return OpenAIEmbeddings(model=config.embedding_model), f"openai:{config.embedding_model}"
+
+def _local():
+    # Optional: sentence-transformers on CPU, no network once the model is on disk
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    model = config.local_embedding_model
+    try:
+        embedder = HuggingFaceEmbeddings(model_name=model, model_kwargs={"device": "cpu"})
+    except ImportError as e:
+        raise RuntimeError("EMBEDDING_BACKEND=local requires sentence-transformers") from e
+    return embedder, f"local:{model}"
+
+def _hashing():
+    e = HashingEmbeddings()
+    return e, e.model_id
+
+EMBEDDERS: Dict[str, Callable] = {"openai": _openai, "local": _local, "hashing": _hashing}
+
+def register_embedder(name: str, factory: Callable) -> None:
+    """Registers a backend factory returning (Embeddings, model_id)."""
+    EMBEDDERS[name] = factory
+
+def get_embedder(backend: str = None) -> CachedEmbeddings:
+    backend = backend or config.embedding_backend
+    if backend not in EMBEDDERS:
+        raise ValueError(f"Unknown embedding backend: {backend}")
+    embedder, model_id = EMBEDDERS[backend]()
+    return CachedEmbeddings(embedder, model_id, config.embedding_cache_path, config.embedding_cache_max_entries)
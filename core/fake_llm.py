@@ -0,0 +1,102 @@
+import re, time, random, asyncio, hashlib, threading
+from typing import Any, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import PrivateAttr
+from core.schema import InfraBlueprint
+
+REGION_RE = re.compile(r"\b(?:us|eu|ap|sa|ca|me|af)-(?:north|south|east|west|central|northeast|southeast)-\d\b")
+CIDR_RE = re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}/\d{1,2}\b")
+APP_WORDS = ("app", "api", "service", "web", "docker", "container")
+
+class FakeLLMError(RuntimeError):
+    """Injected failure, raised at the configured error rate."""
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic offline stand-in for ChatOpenAI. The same prompt always yields the
+    same content: a schema-valid InfraBlueprint in json_mode, otherwise an architecture
+    description. Latency, jitter and errors follow a seeded sequence so load tests are
+    reproducible.
+    """
+
+    json_mode: bool = False
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    seed: int = 0
+    _rng: Any = PrivateAttr(default=None)
+    _rng_lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "deckforge-fake"
+
+    @property
+    def _identifying_params(self):
+        return {"json_mode": self.json_mode, "seed": self.seed}
+
+    def _prompt(self, messages: List[BaseMessage]) -> str:
+        parts = []
+        for m in messages:
+            if isinstance(m.content, str): parts.append(m.content)
+            else: parts.extend(p.get("text", "") for p in m.content if isinstance(p, dict))
+        return "\n".join(parts)
+
+    def _has_image(self, messages: List[BaseMessage]) -> bool:
+        return any(
+            isinstance(m.content, list) and any(isinstance(p, dict) and p.get("type") == "image_url" for p in m.content)
+            for m in messages
+        )
+
+    def _draw(self):
+        """Returns (delay, fail) from the seeded sequence shared by all calls on this model."""
+        with self._rng_lock:
+            if self._rng is None: self._rng = random.Random(self.seed)
+            return self.latency + self._rng.uniform(0, self.jitter), self._rng.random() < self.error_rate
+
+    def _blueprint(self, prompt: str) -> str:
+        idea = prompt.split("Standards:")[0]
+        idea = idea.split("infra idea:", 1)[-1]
+        words = re.findall(r"[a-z0-9]+", idea.lower())
+        name = "-".join(words[:3]) or "project"
+        name = f"{name}-{hashlib.sha1(idea.encode()).hexdigest()[:6]}"
+        region = REGION_RE.search(prompt)
+        cidr = CIDR_RE.search(prompt)
+        bp = InfraBlueprint(
+            project_name=name,
+            region=region.group(0) if region else "us-east-1",
+            vpc_cidr=cidr.group(0) if cidr else "10.0.0.0/16",
+            app_config={"enabled": any(w in words for w in APP_WORDS)}
+        )
+        return bp.model_dump_json()
+
+    def _content(self, messages: List[BaseMessage]) -> str:
+        prompt = self._prompt(messages)
+        if self.json_mode: return self._blueprint(prompt)
+        if self._has_image(messages):
+            return "A VPC with a public subnet hosting one application server behind an internet gateway, and a private database subnet."
+        return f"Acknowledged: {prompt[:200]}"
+
+    def _result(self, messages, fail):
+        if fail: raise FakeLLMError("Injected fake LLM failure")
+        content = self._content(messages)
+        # Roughly 4 characters per token, enough for instrumentation and cost estimates
+        tokens_in, tokens_out = max(1, len(self._prompt(messages)) // 4), max(1, len(content) // 4)
+        message = AIMessage(content=content, usage_metadata={
+            "input_tokens": tokens_in,
+            "output_tokens": tokens_out,
+            "total_tokens": tokens_in + tokens_out
+        })
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+        delay, fail = self._draw()
+        if delay: time.sleep(delay)
+        return self._result(messages, fail)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+        delay, fail = self._draw()
+        if delay: await asyncio.sleep(delay)
+        return self._result(messages, fail)
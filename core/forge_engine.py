@@ -1,24 +1,196 @@
-from jinja2 import Environment, FileSystemLoader
+import os, json, hashlib, threading
+from typing import Dict, List, NamedTuple, Optional
+import yaml
+from pydantic import BaseModel
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, TemplateError, meta
+from core.config import config
+from utils.logger import logger
+from utils.pool import SharedPool
+
+MANIFEST_FILE = "manifest.yml"
+
+_environments = {}
+_env_lock = threading.Lock()
+render_pool = SharedPool("forge-render", lambda: config.render_workers)
+
+class ArtifactSpec(BaseModel):
+    path: str
+    template: str
+    stage: str = "code"
+    when: Optional[str] = None
+
+class RenderResult(NamedTuple):
+    artifacts: Dict[str, str]
+    fingerprints: Dict[str, str]
+    changed: List[str]
+    removed: List[str]
+
+# Artifacts added in code on top of the manifest file
+ARTIFACTS: List[ArtifactSpec] = []
+
+def register_artifact(path, template, stage="code", when=None):
+    """Adds an artifact to every forge; `when` is a Jinja expression over the blueprint."""
+    ARTIFACTS.append(ArtifactSpec(path=path, template=template, stage=stage, when=when))
+
+def load_manifest(path):
+    with open(path) as f:
+        data = yaml.safe_load(f) or {}
+    return [ArtifactSpec(**a) for a in data.get("artifacts", [])]
+
+def get_environment(templates_path=None):
+    """
+    Process-wide Jinja environment per templates directory. Compiled templates stay
+    in memory (cache_size=-1) and are re-checked only against the source file's
+    mtime; compiled bytecode also persists on disk, so new processes skip the compile.
+    """
+    path = os.path.abspath(templates_path or config.templates_path)
+    with _env_lock:
+        env = _environments.get(path)
+        if env is None:
+            bytecode_cache = None
+            if config.template_cache_dir:
+                cache_dir = os.path.abspath(config.template_cache_dir)
+                os.makedirs(cache_dir, exist_ok=True)
+                bytecode_cache = FileSystemBytecodeCache(cache_dir)
+            env = _environments[path] = Environment(
+                loader=FileSystemLoader(path),
+                trim_blocks=True,
+                cache_size=-1,
+                auto_reload=config.template_auto_reload,
+                bytecode_cache=bytecode_cache
+            )
+        return env
 
 class ForgeEngine:
-    def __init__(self):
-        self.env = Environment(loader=FileSystemLoader('templates'), trim_blocks=True)
+    def __init__(self, templates_path=None, manifest_path=None):
+        self.env = get_environment(templates_path)
+        self.manifest_path = manifest_path or config.artifact_manifest or os.path.join(
+            templates_path or config.templates_path, MANIFEST_FILE
+        )
+        self.specs = load_manifest(self.manifest_path) if os.path.exists(self.manifest_path) else []
+        self._conditions = {}
+        self._inputs = {}
 
-    def render(self, state):
-        bp = state.current_blueprint
-        ctx = bp.model_dump()
-        ctx['retrieved_policy'] = state.retrieved_policy
-        
-        manifest = {
-            "terraform/main.tf": "terraform/main.tf.j2",
-            "ansible/hardening.yml": "ansible/hardening.yml.j2",
-            "README.md": "docs/README.md.j2"
+    def precompile(self):
+        """Loads every template and manifest condition up front so the first forge does not pay for compilation."""
+        compiled = 0
+        for name in self.env.list_templates(extensions=["j2"]):
+            try:
+                self.env.get_template(name)
+                compiled += 1
+            except TemplateError as e:
+                logger.error(f"Template {name} failed to compile: {e}")
+        for spec in self.artifacts():
+            if spec.when: self._condition(spec.when)
+        return compiled
+
+    def artifacts(self):
+        return self.specs + ARTIFACTS
+
+    def stage_paths(self, stage):
+        return {a.path for a in self.artifacts() if a.stage == stage}
+
+    def _condition(self, when):
+        expr = self._conditions.get(when)
+        if expr is None: expr = self._conditions[when] = self.env.compile_expression(when)
+        return expr
+
+    def manifest(self, stage, ctx):
+        """{artifact path: template} for one stage, keeping only artifacts whose condition holds."""
+        return {
+            a.path: a.template for a in self.artifacts()
+            if a.stage == stage and (not a.when or self._condition(a.when)(**ctx))
         }
-        if bp.app_config.enabled:
-            manifest["docker/Dockerfile"] = "docker/Dockerfile.j2"
-        
-        for path, tmpl in manifest.items():
-            state.artifacts[path] = self.env.get_template(tmpl).render(**ctx)
-        
-        state.diagram_code = f"graph TD; User-->VPC; subgraph VPC; App; DB; end"
-        return state
\ No newline at end of file
+
+    def template_inputs(self, name):
+        """
+        (digest, variables) for a template and everything it includes or extends:
+        a digest of their sources and the top-level context keys they read. variables
+        is None when an include is dynamic, meaning "depends on the whole context".
+        Cached until Jinja reloads any of the templates involved.
+        """
+        cached = self._inputs.get(name)
+        if cached is not None and all(self.env.get_template(n) is t for n, t in cached[0]):
+            return cached[1], cached[2]
+        source, _, _ = self.env.loader.get_source(self.env, name)
+        ast = self.env.parse(source)
+        digest = hashlib.sha256(source.encode())
+        variables = set(meta.find_undeclared_variables(ast))
+        involved = [(name, self.env.get_template(name))]
+        for ref in meta.find_referenced_templates(ast):
+            if ref is None:
+                variables = None
+                continue
+            child_digest, child_vars = self.template_inputs(ref)
+            digest.update(child_digest.encode())
+            involved += self._inputs[ref][0]
+            if variables is not None and child_vars is not None: variables |= child_vars
+            else: variables = None
+        variables = frozenset(variables) if variables is not None else None
+        self._inputs[name] = (tuple(involved), digest.hexdigest(), variables)
+        return digest.hexdigest(), variables
+
+    def fingerprint(self, tmpl, ctx):
+        """Changes only when the template or a context value it reads changes."""
+        digest, variables = self.template_inputs(tmpl)
+        inputs = ctx if variables is None else {k: ctx.get(k) for k in variables}
+        payload = json.dumps({"template": digest, "inputs": inputs}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def build(self, stage, state, ctx=None):
+        """
+        Renders one stage incrementally against state.artifacts: an artifact whose
+        fingerprint matches state.artifact_fingerprints keeps its previous content.
+        `changed` lists re-rendered paths, `removed` those whose condition no longer holds.
+        """
+        ctx = ctx or self.context(state)
+        manifest = self.manifest(stage, ctx)
+        fingerprints = {path: self.fingerprint(tmpl, ctx) for path, tmpl in manifest.items()}
+        stale = {
+            path: tmpl for path, tmpl in manifest.items()
+            if path not in state.artifacts or state.artifact_fingerprints.get(path) != fingerprints[path]
+        }
+        artifacts = {path: state.artifacts[path] for path in manifest if path not in stale}
+        artifacts.update(self._render(stale, ctx))
+        removed = sorted((self.stage_paths(stage) - set(manifest)) & set(state.artifacts))
+        return RenderResult(artifacts, fingerprints, sorted(stale), removed)
+
+    def context(self, state):
+        ctx = state.current_blueprint.model_dump()
+        ctx['retrieved_policy'] = state.retrieved_policy
+        ctx['user_idea'] = state.user_idea
+        return ctx
+
+    def diagram(self, bp):
+        return f"graph TD; User-->VPC; subgraph VPC; App; DB; end"
+
+    def _render_one(self, tmpl, ctx):
+        return self.env.get_template(tmpl).render(**ctx)
+
+    def _render(self, manifest, ctx):
+        # Templates are independent, so larger manifests fan out over a shared thread pool
+        if config.render_workers <= 1 or len(manifest) < 2:
+            return {path: self._render_one(tmpl, ctx) for path, tmpl in manifest.items()}
+        rendered = render_pool.get().map(lambda tmpl: self._render_one(tmpl, ctx), manifest.values())
+        return dict(zip(manifest, rendered))
+
+    def render_code(self, state):
+        """Deployable artifacts (what the validator checks)."""
+        ctx = self.context(state)
+        return self._render(self.manifest("code", ctx), ctx)
+
+    def docs_context(self, state):
+        ctx = self.context(state)
+        ctx['diagram_code'] = self.diagram(state.current_blueprint)
+        return ctx
+
+    def render_docs(self, state):
+        """Documentation artifacts and the diagram; independent of validation."""
+        ctx = self.docs_context(state)
+        return self._render(self.manifest("docs", ctx), ctx), ctx['diagram_code']
+
+    def render(self, state):
+        state.artifacts.update(self.render_code(state))
+        docs, state.diagram_code = self.render_docs(state)
+        state.artifacts.update(docs)
+        return state
@@ -0,0 +1,321 @@
+import os
+from utils.logger import logger
+from typing import Dict, List, NamedTuple, Set, Tuple
+
+class HCLIssue(NamedTuple):
+    file: str
+    line: int
+    column: int
+    summary: str
+    detail: str = ""
+
+class Token(NamedTuple):
+    kind: str  # ident | number | string | heredoc | op | open | close
+    value: str
+    line: int
+    column: int
+    depth: int
+
+# Top-level blocks terraform accepts and how many labels each takes
+BLOCK_LABELS = {
+    "terraform": 0, "locals": 0, "moved": 0, "import": 0, "removed": 0,
+    "variable": 1, "output": 1, "provider": 1, "module": 1, "check": 1,
+    "resource": 2, "data": 2, "ephemeral": 2
+}
+# Roots that never name a declaration
+BUILTIN_ROOTS = {"count", "each", "self", "path", "terraform", "ephemeral"}
+# Blocks whose references point at addresses that may no longer exist
+UNCHECKED_BLOCKS = {"moved", "removed", "import"}
+
+OPERATORS = ("...", "==", "!=", "<=", ">=", "&&", "||", "=>", "::")
+PAIRS = {"{": "}", "[": "]", "(": ")"}
+
+class HCLSyntaxError(Exception):
+    def __init__(self, line, column, summary, detail=""):
+        self.issue = (line, column, summary, detail)
+
+class HCLUnsupported(HCLSyntaxError):
+    """Syntax this checker does not model; only terraform can say whether it is valid."""
+
+def _ident_end(src, i):
+    while i < len(src) and (src[i].isalnum() or src[i] in "_-"): i += 1
+    return i
+
+def tokenize(src: str) -> List[Token]:
+    """
+    Splits HCL source into tokens, descending into string and heredoc templates so
+    references inside ${...} are seen. Raises HCLSyntaxError on the first syntax problem.
+    """
+    tokens: List[Token] = []
+    # (kind, closer or heredoc marker, line, column, token index[, string body start])
+    stack: List[tuple] = []
+    i, n, line, line_start = 0, len(src), 1, 0
+
+    def emit(kind, value, start, depth=None):
+        tokens.append(Token(kind, value, line, start - line_start + 1, len(stack) if depth is None else depth))
+
+    while i < n:
+        c = src[i]
+        top = stack[-1] if stack else None
+
+        if top and top[0] == "heredoc":
+            if i == line_start:
+                eol = src.find("\n", i)
+                eol = n if eol < 0 else eol
+                if src[i:eol].strip() == top[1]:
+                    stack.pop()
+                    i = eol
+                    continue
+            if src.startswith(("$${", "%%{"), i): i += 3
+            elif src.startswith(("${", "%{"), i):
+                stack.append(("interp", "}", line, i - line_start + 1, len(tokens)))
+                i += 3 if src.startswith("~", i + 2) else 2  # ${~ strip marker
+            else:
+                if c == "\n": line, line_start = line + 1, i + 1
+                i += 1
+            continue
+
+        if top and top[0] == "string":
+            if c == "\\": i += 2
+            elif src.startswith(("$${", "%%{"), i): i += 3
+            elif src.startswith(("${", "%{"), i):
+                stack.append(("interp", "}", line, i - line_start + 1, len(tokens)))
+                i += 3 if src.startswith("~", i + 2) else 2  # ${~ strip marker
+            elif c == '"':
+                stack.pop()
+                start = tokens[top[4]]
+                tokens[top[4]] = start._replace(value=src[top[5]:i])
+                i += 1
+            elif c == "\n":
+                raise HCLSyntaxError(top[2], top[3], "Unterminated template string", "A quoted string must end with a closing quote on the same line.")
+            else: i += 1
+            continue
+
+        if c == "\n":
+            line, line_start = line + 1, i + 1
+            i += 1
+        elif c in " \t\r": i += 1
+        elif c == "#" or src.startswith("//", i):
+            eol = src.find("\n", i)
+            i = n if eol < 0 else eol
+        elif src.startswith("/*", i):
+            end = src.find("*/", i + 2)
+            if end < 0: raise HCLSyntaxError(line, i - line_start + 1, "Unterminated comment", "A /* comment must be closed with */.")
+            line += src.count("\n", i, end)
+            if "\n" in src[i:end]: line_start = src.rfind("\n", i, end) + 1
+            i = end + 2
+        elif c == '"':
+            emit("string", "", i)
+            stack.append(("string", '"', line, i - line_start + 1, len(tokens) - 1, i + 1))
+            i += 1
+        elif src.startswith("<<", i):
+            j = i + 2 + (src[i + 2:i + 3] == "-")
+            end = _ident_end(src, j)
+            eol = src.find("\n", end)
+            if end == j or eol < 0 or src[end:eol].strip():
+                raise HCLSyntaxError(line, i - line_start + 1, "Invalid heredoc", "A heredoc needs a marker such as <<EOF followed by a newline.")
+            emit("heredoc", src[j:end], i)
+            stack.append(("heredoc", src[j:end], line, i - line_start + 1, len(tokens) - 1))
+            line, line_start = line + 1, eol + 1
+            i = eol + 1
+        elif c.isalpha() or c == "_":
+            end = _ident_end(src, i)
+            emit("ident", src[i:end], i)
+            i = end
+        elif c.isdigit():
+            end = i
+            while end < n and (src[end].isalnum() or src[end] == "." and src[end + 1:end + 2].isdigit()): end += 1
+            emit("number", src[i:end], i)
+            i = end
+        elif c in PAIRS:
+            emit("open", c, i)
+            stack.append(("bracket", PAIRS[c], line, i - line_start + 1, len(tokens) - 1))
+            i += 1
+        elif c == "~" and top and top[0] == "interp" and src.startswith("}", i + 1):
+            i += 1  # ~} strip marker
+        elif c in "}])":
+            if top is None:
+                raise HCLSyntaxError(line, i - line_start + 1, f"Unexpected '{c}'", "There is no open bracket for it to close.")
+            if top[1] != c:
+                raise HCLSyntaxError(line, i - line_start + 1, f"Mismatched '{c}'", f"Expected '{top[1]}' to close the bracket opened on line {top[2]}.")
+            stack.pop()
+            if top[0] == "bracket": emit("close", c, i)
+            i += 1
+        else:
+            op = next((o for o in OPERATORS if src.startswith(o, i)), None) or c
+            if op not in "=!<>+-*/%?:.,&|" and op not in OPERATORS:
+                raise HCLUnsupported(line, i - line_start + 1, "Invalid character", f"The character {c!r} is not valid here.")
+            emit("op", op, i)
+            i += len(op)
+
+    if stack:
+        kind, closer, ln, col = stack[-1][:4]
+        if kind == "string": raise HCLSyntaxError(ln, col, "Unterminated template string", "A quoted string must end with a closing quote.")
+        if kind == "heredoc": raise HCLSyntaxError(ln, col, "Unterminated heredoc", f"No line with the closing marker {closer} was found.")
+        raise HCLSyntaxError(ln, col, "Unclosed bracket", f"Expected '{closer}' before the end of the file.")
+    return tokens
+
+class _Module:
+    """Declarations and references collected across the .tf files of one directory."""
+
+    def __init__(self):
+        self.variables: Set[str] = set()
+        self.locals: Set[str] = set()
+        self.modules: Set[str] = set()
+        self.providers: Set[str] = set()
+        self.resources: Set[Tuple[str, str]] = set()
+        self.data: Set[Tuple[str, str]] = set()
+        self.seen: Dict[tuple, Tuple[str, int]] = {}
+        self.issues: List[HCLIssue] = []
+
+    def declare(self, kind, key, file, line, override=False):
+        if kind == "resource": self.resources.add(key)
+        elif kind == "data": self.data.add(key)
+        elif kind == "variable": self.variables.add(key)
+        elif kind == "local": self.locals.add(key)
+        elif kind == "module": self.modules.add(key)
+        elif kind == "provider": self.providers.add(key)
+        if override or kind == "provider": return
+        previous = self.seen.setdefault((kind, key), (file, line))
+        if previous != (file, line):
+            name = " ".join(f'"{k}"' for k in key) if isinstance(key, tuple) else f'"{key}"'
+            self.issues.append(HCLIssue(file, line, 1, f"Duplicate {kind} declaration",
+                                        f"{kind} {name} was already declared at {previous[0]} line {previous[1]}."))
+
+def _blocks(file, tokens, module, override):
+    """Checks the top-level block structure and records declarations. Returns [(type, start, end)]."""
+    blocks = []
+    i = 0
+    while i < len(tokens):
+        t = tokens[i]
+        if t.kind != "ident":
+            raise HCLSyntaxError(t.line, t.column, "Argument or block definition required", "A top-level block type such as resource was expected.")
+        if i + 1 < len(tokens) and tokens[i + 1].kind == "op" and tokens[i + 1].value == "=":
+            raise HCLSyntaxError(t.line, t.column, "Unsupported argument", f'An argument named "{t.value}" is not expected here.')
+        j = i + 1
+        while j < len(tokens) and tokens[j].kind in ("string", "ident") and tokens[j].depth == 0: j += 1
+        if j >= len(tokens) or tokens[j].kind != "open" or tokens[j].value != "{":
+            raise HCLSyntaxError(t.line, t.column, "Invalid block definition", f'The {t.value} block needs a body in braces.')
+        labels = [x.value for x in tokens[i + 1:j]]
+        if t.value not in BLOCK_LABELS:
+            raise HCLUnsupported(t.line, t.column, "Unsupported block type", f'Blocks of type "{t.value}" are not expected here.')
+        if len(labels) != BLOCK_LABELS[t.value]:
+            raise HCLSyntaxError(t.line, t.column, "Invalid block definition", f'A {t.value} block takes {BLOCK_LABELS[t.value]} label(s), not {len(labels)}.')
+        end = j + 1
+        while tokens[end].depth != 0: end += 1
+        body = tokens[j + 1:end]
+        if t.value in ("resource", "data"): module.declare(t.value, tuple(labels), file, t.line, override)
+        elif t.value in ("variable", "module", "provider", "output"): module.declare(t.value, labels[0], file, t.line, override)
+        elif t.value == "locals":
+            for k, x in enumerate(body[:-1]):
+                if x.kind == "ident" and x.depth == 1 and body[k + 1].value == "=" and body[k + 1].kind == "op":
+                    module.declare("local", x.value, file, x.line, override)
+        elif t.value == "terraform":
+            for k, x in enumerate(body[:-2]):
+                if x.kind == "ident" and x.value == "required_providers" and body[k + 1].value == "{":
+                    for p, y in enumerate(body[k + 2:-1], k + 2):
+                        if y.depth == x.depth + 1 and y.kind == "ident" and body[p + 1].value == "=":
+                            module.providers.add(y.value)
+        # Nested scoped data sources (check blocks) are declarations too
+        for k, x in enumerate(body[:-3]):
+            if x.kind == "ident" and x.value == "data" and body[k + 1].kind == "string" and body[k + 2].kind == "string":
+                module.data.add((body[k + 1].value, body[k + 2].value))
+        blocks.append((t.value, j, end))
+        i = end + 1
+    return blocks
+
+def _bound_names(tokens):
+    """Iterator names from for expressions and dynamic blocks, which shadow nothing terraform declares."""
+    names = set()
+    for k, t in enumerate(tokens[:-1]):
+        nxt = tokens[k + 1]
+        if t.kind == "ident" and t.value == "for" and nxt.kind == "ident":
+            names.add(nxt.value)
+            if k + 3 < len(tokens) and tokens[k + 2].value == "," and tokens[k + 3].kind == "ident": names.add(tokens[k + 3].value)
+        elif t.kind == "ident" and t.value == "dynamic" and nxt.kind == "string": names.add(nxt.value)
+        elif t.kind == "ident" and t.value == "iterator" and nxt.value == "=" and k + 2 < len(tokens): names.add(tokens[k + 2].value)
+    return names
+
+def _references(file, tokens, blocks, module):
+    issues = []
+    bound = _bound_names(tokens)
+    resource_prefixes = module.providers | {t.split("_", 1)[0] for t, _ in module.resources}
+
+    def ident(k):
+        return tokens[k].value if k < len(tokens) and tokens[k].kind == "ident" else None
+
+    def dot(k):
+        return k < len(tokens) and tokens[k].kind == "op" and tokens[k].value == "."
+
+    for block_type, start, end in blocks:
+        if block_type in UNCHECKED_BLOCKS: continue
+        for k in range(start + 1, end):
+            root = ident(k)
+            if root is None or not dot(k + 1) or ident(k + 2) is None: continue
+            prev = tokens[k - 1]
+            if prev.kind == "op" and prev.value in (".", "::"): continue
+            if root in BUILTIN_ROOTS or root in bound: continue
+            t, name = tokens[k], ident(k + 2)
+            if root == "var" and name not in module.variables:
+                issues.append(HCLIssue(file, t.line, t.column, "Reference to undeclared input variable",
+                                       f'An input variable with the name "{name}" has not been declared.'))
+            elif root == "local" and name not in module.locals:
+                issues.append(HCLIssue(file, t.line, t.column, "Reference to undeclared local value",
+                                       f'A local value with the name "{name}" has not been declared.'))
+            elif root == "module" and name not in module.modules:
+                issues.append(HCLIssue(file, t.line, t.column, "Reference to undeclared module",
+                                       f'No module call named "{name}" is declared in the root module.'))
+            elif root == "data":
+                if not dot(k + 3) or ident(k + 4) is None: continue
+                if (name, ident(k + 4)) not in module.data:
+                    issues.append(HCLIssue(file, t.line, t.column, "Reference to undeclared resource",
+                                           f'A data resource "{name}" "{ident(k + 4)}" has not been declared in the root module.'))
+            elif "_" in root and root.split("_", 1)[0] in resource_prefixes and (root, name) not in module.resources:
+                issues.append(HCLIssue(file, t.line, t.column, "Reference to undeclared resource",
+                                       f'A managed resource "{root}" "{name}" has not been declared in the root module.'))
+    return issues
+
+def check_terraform(tf_path: str) -> List[HCLIssue]:
+    """
+    In-process syntax and reference check of the .tf files in `tf_path`: brackets,
+    strings and heredocs, top-level block shapes, duplicate declarations and
+    references to undeclared variables, locals, modules and resources. It errs on
+    the side of passing: syntax it does not model, or any failure of the check
+    itself, returns no issues and leaves the verdict to `terraform validate`.
+    """
+    try:
+        return _check(tf_path)
+    except HCLUnsupported as e:
+        logger.info(f"HCL precheck skipped for {tf_path}: {e.issue[2]} at line {e.issue[0]}")
+    except Exception as e:
+        logger.warning(f"HCL precheck failed on {tf_path}: {e!r}")
+    return []
+
+def _check(tf_path):
+    names = sorted(os.listdir(tf_path))
+    module = _Module()
+    parsed = []
+    for name in [n for n in names if n.endswith(".tf")]:
+        with open(os.path.join(tf_path, name)) as f:
+            src = f.read()
+        try:
+            tokens = tokenize(src)
+            blocks = _blocks(name, tokens, module, name == "override.tf" or name.endswith("_override.tf"))
+        except HCLUnsupported:
+            raise
+        except HCLSyntaxError as e:
+            module.issues.append(HCLIssue(name, *e.issue))
+            continue
+        parsed.append((name, tokens, blocks))
+    # References can point into JSON-syntax files this check does not read
+    if module.issues or any(n.endswith(".tf.json") for n in names): return module.issues
+    issues = []
+    for name, tokens, blocks in parsed:
+        issues += _references(name, tokens, blocks, module)
+    return issues
+
+def format_issues(issues: List[HCLIssue]) -> str:
+    """Renders issues the way `terraform validate` prints diagnostics."""
+    return "\n".join(
+        f"Error: {i.summary}\n\n  on {i.file} line {i.line}, column {i.column}:\n  {i.detail}\n" for i in issues
+    )
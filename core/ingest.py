@@ -0,0 +1,98 @@
+import os, time, hashlib, multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from langchain_community.document_loaders import TextLoader, PyPDFLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+LOADERS = {".md": TextLoader, ".pdf": PyPDFLoader}
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 100
+
+_splitter = None
+
+def chunk_file(rel, fp, digest=""):
+    """
+    Parses and splits one file. Runs in a pool worker, so it only returns picklable data.
+    Chunk ids include the content digest, so a changed file never reuses the ids
+    of the chunks it replaces.
+    """
+    global _splitter
+    if _splitter is None:
+        _splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    docs = LOADERS[os.path.splitext(fp)[1].lower()](fp).load()
+    chunks = _splitter.split_documents(docs)
+    ids = [hashlib.sha1(f"{rel}#{digest}#{i}".encode()).hexdigest() for i in range(len(chunks))]
+    for c, i in zip(chunks, ids):
+        c.metadata["source"] = rel
+        c.metadata["chunk_id"] = i
+    return rel, chunks, ids
+
+class IngestReport:
+    """Running throughput counters for one ingest pass."""
+
+    def __init__(self, total_files):
+        self.total_files = total_files
+        self.files = 0
+        self.chunks = 0
+        self.started = time.perf_counter()
+
+    def as_dict(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return {
+            "files": self.files,
+            "total_files": self.total_files,
+            "chunks": self.chunks,
+            "seconds": round(elapsed, 3),
+            "files_per_s": round(self.files / elapsed, 2),
+            "chunks_per_s": round(self.chunks / elapsed, 2)
+        }
+
+def default_workers(workers=None):
+    # Daemonic processes (e.g. pool children) may not fork their own pool
+    if multiprocessing.current_process().daemon: return 1
+    return max(1, workers or os.cpu_count() or 1)
+
+def parse_files(jobs, workers=None):
+    """
+    Takes (rel, path[, digest]) jobs and yields (rel, chunks, ids) as files finish parsing, in completion order.
+    At most 2x`workers` files are in flight, so a slow consumer (the embedder)
+    applies back-pressure instead of the whole knowledge base piling up in memory.
+    """
+    workers = default_workers(workers)
+    if workers == 1 or len(jobs) <= 1:
+        for job in jobs: yield chunk_file(*job)
+        return
+    pending, queue = set(), iter(jobs)
+    # Called from warm-up threads: forking a threaded process can deadlock the child, so start clean workers
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method)) as pool:
+        for job in queue:
+            pending.add(pool.submit(chunk_file, *job))
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for f in done: yield f.result()
+        for f in as_completed(pending): yield f.result()
+
+def ingest(jobs, sink, batch_size=64, workers=None, progress=None):
+    """
+    Streams parsed files into `sink(file_batch)` in batches of roughly `batch_size`
+    chunks, where file_batch is a list of (rel, chunks, ids). Files are never split
+    across batches so a crash leaves every recorded file fully indexed.
+    """
+    report = IngestReport(len(jobs))
+    batch, batch_chunks = [], 0
+
+    def flush():
+        nonlocal batch, batch_chunks
+        if not batch: return
+        sink(batch)
+        report.files += len(batch)
+        report.chunks += batch_chunks
+        batch, batch_chunks = [], 0
+        if progress: progress(report.as_dict())
+
+    for rel, chunks, ids in parse_files(jobs, workers):
+        batch.append((rel, chunks, ids))
+        batch_chunks += len(chunks)
+        if batch_chunks >= batch_size: flush()
+    flush()
+    return report.as_dict()
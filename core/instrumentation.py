@@ -0,0 +1,190 @@
+import time, asyncio, threading, contextvars
+from typing import Any, Dict
+from pydantic import BaseModel, TypeAdapter
+from langchain_core.callbacks import BaseCallbackHandler
+from core.config import config
+from core.schema import NodeMetric
+from utils.logger import logger
+
+# Token usage of the node currently running in this context; LLM callbacks add to it
+_usage = contextvars.ContextVar("deckforge_node_usage", default=None)
+_any = TypeAdapter(Any)
+
+WALL_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+class UsageMeter(BaseCallbackHandler):
+    """Attached to every shared LLM client; credits token usage to the running node."""
+
+    run_inline = True
+
+    def on_llm_end(self, response, **kwargs):
+        usage = _usage.get()
+        if usage is None: return
+        tokens_in = tokens_out = 0
+        for generations in response.generations:
+            for g in generations:
+                meta = getattr(getattr(g, "message", None), "usage_metadata", None) or {}
+                tokens_in += meta.get("input_tokens", 0)
+                tokens_out += meta.get("output_tokens", 0)
+        if not (tokens_in or tokens_out):
+            token_usage = (response.llm_output or {}).get("token_usage") or {}
+            tokens_in, tokens_out = token_usage.get("prompt_tokens", 0), token_usage.get("completion_tokens", 0)
+        with usage["lock"]:
+            usage["in"] += tokens_in
+            usage["out"] += tokens_out
+
+usage_meter = UsageMeter()
+
+def payload_bytes(value) -> int:
+    try:
+        return len(_any.dump_json(value))
+    except Exception:
+        return 0
+
+class LogSink:
+    def record(self, metric: NodeMetric):
+        cpu = f"{metric.cpu_s:.3f}s" if metric.cpu_s is not None else "n/a"
+        logger.info(
+            f"node={metric.graph}.{metric.node} wall={metric.wall_s:.3f}s cpu={cpu} "
+            f"tokens_in={metric.tokens_in} tokens_out={metric.tokens_out} "
+            f"bytes_in={metric.bytes_in} bytes_out={metric.bytes_out} error={metric.error or '-'}"
+        )
+
+class HistogramSink:
+    """In-process per-(graph, node) histograms and counters, rendered as Prometheus text."""
+
+    def __init__(self, buckets=WALL_BUCKETS):
+        self.buckets = buckets
+        self.series: Dict[tuple, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _new(self):
+        return {
+            "wall": [0] * len(self.buckets), "wall_sum": 0.0, "cpu_sum": 0.0, "count": 0, "errors": 0,
+            "tokens_in": 0, "tokens_out": 0, "bytes_in": 0, "bytes_out": 0
+        }
+
+    def record(self, metric: NodeMetric):
+        with self._lock:
+            s = self.series.setdefault((metric.graph, metric.node), self._new())
+            for i, bound in enumerate(self.buckets):
+                if metric.wall_s <= bound: s["wall"][i] += 1
+            s["wall_sum"] += metric.wall_s
+            s["cpu_sum"] += metric.cpu_s or 0.0
+            s["count"] += 1
+            s["errors"] += 1 if metric.error else 0
+            for key in ("tokens_in", "tokens_out", "bytes_in", "bytes_out"): s[key] += getattr(metric, key)
+
+    def snapshot(self):
+        with self._lock:
+            return {f"{g}.{n}": {**s, "wall": list(s["wall"])} for (g, n), s in self.series.items()}
+
+    def clear(self):
+        with self._lock: self.series.clear()
+
+    def prometheus(self) -> str:
+        lines = [
+            "# HELP deckforge_node_wall_seconds Wall time per graph node",
+            "# TYPE deckforge_node_wall_seconds histogram"
+        ]
+        with self._lock:
+            series = sorted(self.series.items())
+            for (g, n), s in series:
+                labels = f'graph="{g}",node="{n}"'
+                for bound, count in zip(self.buckets, s["wall"]):
+                    lines.append(f'deckforge_node_wall_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'deckforge_node_wall_seconds_bucket{{{labels},le="+Inf"}} {s["count"]}')
+                lines.append(f"deckforge_node_wall_seconds_sum{{{labels}}} {s['wall_sum']}")
+                lines.append(f"deckforge_node_wall_seconds_count{{{labels}}} {s['count']}")
+            counters = [
+                ("deckforge_node_cpu_seconds_total", "CPU time per graph node (sync nodes)", lambda s: [("", s["cpu_sum"])]),
+                ("deckforge_node_errors_total", "Failed node runs", lambda s: [("", s["errors"])]),
+                ("deckforge_node_tokens_total", "LLM tokens per graph node",
+                 lambda s: [(',direction="in"', s["tokens_in"]), (',direction="out"', s["tokens_out"])]),
+                ("deckforge_node_payload_bytes_total", "Serialized state in and update out per graph node",
+                 lambda s: [(',direction="in"', s["bytes_in"]), (',direction="out"', s["bytes_out"])])
+            ]
+            for name, help_text, values in counters:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                for (g, n), s in series:
+                    for extra, value in values(s):
+                        lines.append(f'{name}{{graph="{g}",node="{n}"{extra}}} {value}')
+        return "\n".join(lines) + "\n"
+
+histograms = HistogramSink()
+
+METRIC_SINKS = {"log": LogSink(), "histogram": histograms}
+
+def register_metric_sink(name, sink):
+    """Registers an object with record(NodeMetric); enable it via INSTRUMENTATION_SINKS."""
+    METRIC_SINKS[name] = sink
+
+def _emit(metric):
+    for name in config.instrumentation_sinks:
+        sink = METRIC_SINKS.get(name)
+        if sink is None: continue
+        try:
+            sink.record(metric)
+        except Exception as e:
+            logger.warning(f"Metric sink {name} failed: {e}")
+
+def _finish(graph, name, state, output, started, cpu_started, usage, error):
+    metric = NodeMetric(
+        graph=graph,
+        node=name,
+        wall_s=round(time.perf_counter() - started, 6),
+        cpu_s=round(time.thread_time() - cpu_started, 6) if cpu_started is not None else None,
+        tokens_in=usage["in"],
+        tokens_out=usage["out"],
+        bytes_in=payload_bytes(state),
+        bytes_out=payload_bytes(output) if output is not None else 0,
+        error=error
+    )
+    _emit(metric)
+    return metric
+
+def _with_metric(output, metric):
+    # Nodes may return the whole state; only forward its fields, never its metrics
+    if isinstance(output, BaseModel):
+        output = {k: getattr(output, k) for k in type(output).model_fields if k != "node_metrics"}
+    return {**(output or {}), "node_metrics": [metric]}
+
+def instrument(graph, name, node):
+    """
+    Wraps a graph node to record wall time, CPU time (sync nodes, per thread), LLM
+    tokens and payload sizes. The metric is sent to the configured sinks and appended
+    to the state's node_metrics.
+    """
+    if asyncio.iscoroutinefunction(node):
+        async def run(state):
+            usage = {"in": 0, "out": 0, "lock": threading.Lock()}
+            token = _usage.set(usage)
+            started, output = time.perf_counter(), None
+            try:
+                output = await node(state)
+            except Exception as e:
+                _finish(graph, name, state, None, started, None, usage, repr(e))
+                raise
+            finally:
+                _usage.reset(token)
+            return _with_metric(output, _finish(graph, name, state, output, started, None, usage, None))
+    else:
+        def run(state):
+            usage = {"in": 0, "out": 0, "lock": threading.Lock()}
+            token = _usage.set(usage)
+            started, cpu_started, output = time.perf_counter(), time.thread_time(), None
+            try:
+                output = node(state)
+            except Exception as e:
+                _finish(graph, name, state, None, started, cpu_started, usage, repr(e))
+                raise
+            finally:
+                _usage.reset(token)
+            return _with_metric(output, _finish(graph, name, state, output, started, cpu_started, usage, None))
+    run.__name__ = getattr(node, "__name__", name)
+    return run
+
+def instrument_nodes(graph, nodes):
+    """Returns {name: node} with every node instrumented, or unchanged when INSTRUMENTATION is off."""
+    if not config.instrumentation: return dict(nodes)
+    return {name: instrument(graph, name, node) for name, node in nodes.items()}
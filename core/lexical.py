@@ -0,0 +1,106 @@
+import os, re, json, math
+from collections import Counter
+from typing import Dict, List, Tuple
+
+# Keeps policy IDs (SEC-042), CIDRs (10.0.0.0/16) and resource names (aws_s3_bucket) whole
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9_.:/\-]*[a-z0-9]|[a-z0-9]")
+PART_RE = re.compile(r"[._:/\-]")
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for tok in TOKEN_RE.findall(text.lower()):
+        tokens.append(tok)
+        # Compound tokens also match on their parts ("aws_s3_bucket" -> "s3")
+        if PART_RE.search(tok):
+            tokens.extend(p for p in PART_RE.split(tok) if p)
+    return tokens
+
+def is_identifier_query(query: str) -> bool:
+    """True when every token looks like an identifier (digits or separators), not prose."""
+    words = query.split()
+    return bool(words) and all(any(ch.isdigit() or ch in "_.:/-" for ch in w.strip(",;")) for w in words)
+
+class BM25Index:
+    """
+    Minimal in-process BM25 inverted index over knowledge base chunks.
+    Lives next to the Chroma collection and is updated with the same
+    chunk ids, so lexical and vector hits can be fused by id.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.texts: Dict[str, str] = {}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_len: Dict[str, int] = {}
+        self.total_len = 0
+
+    def __len__(self):
+        return len(self.texts)
+
+    def copy(self) -> "BM25Index":
+        """Copy for copy-on-write updates; the original keeps serving readers."""
+        clone = BM25Index(self.k1, self.b)
+        clone.texts = dict(self.texts)
+        clone.postings = {term: dict(docs) for term, docs in self.postings.items()}
+        clone.doc_len = dict(self.doc_len)
+        clone.total_len = self.total_len
+        return clone
+
+    def add(self, doc_id: str, text: str) -> None:
+        if doc_id in self.texts: self.remove(doc_id)
+        tf = Counter(tokenize(text))
+        self.texts[doc_id] = text
+        self.doc_len[doc_id] = sum(tf.values())
+        self.total_len += self.doc_len[doc_id]
+        for term, n in tf.items():
+            self.postings.setdefault(term, {})[doc_id] = n
+
+    def remove(self, doc_id: str) -> None:
+        text = self.texts.pop(doc_id, None)
+        if text is None: return
+        self.total_len -= self.doc_len.pop(doc_id)
+        for term in set(tokenize(text)):
+            docs = self.postings.get(term)
+            if docs is None: continue
+            docs.pop(doc_id, None)
+            if not docs: del self.postings[term]
+
+    def search(self, query: str, k: int = 2) -> List[Tuple[str, float]]:
+        n = len(self.texts)
+        if not n: return []
+        avg_len = self.total_len / n
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs: continue
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, tf in docs.items():
+                norm = tf + self.k1 * (1 - self.b + self.b * self.doc_len[doc_id] / avg_len)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+        return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:k]
+
+    def save(self, path: str) -> None:
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.texts, f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        index = cls()
+        try:
+            with open(path) as f:
+                texts = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return index
+        for doc_id, text in texts.items(): index.add(doc_id, text)
+        return index
+
+def reciprocal_rank_fusion(*rankings: List[str], k: int = 60) -> List[str]:
+    """Fuses ranked id lists; robust to the incomparable scales of BM25 and cosine scores."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
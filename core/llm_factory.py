@@ -1,11 +1,247 @@
-import os
+import os, json, time, asyncio, hashlib, threading, weakref
+import httpx
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
 from langchain_openai import ChatOpenAI
+from core.config import config
+from utils.cache import TTLCache, SQLiteStore, RedisStore
+from core.instrumentation import usage_meter
 
-def get_llm(json_mode=False):
+class PoolMetrics:
+    """Process-wide counters for LLM request concurrency."""
+
+    def __init__(self, max_in_flight):
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.waited = 0
+        self.wait_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def started(self, wait):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            if wait > 0.001:
+                self.waited += 1
+                self.wait_seconds += wait
+
+    def finished(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "max_in_flight": self.max_in_flight,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "saturation": round(self.in_flight / self.max_in_flight, 3),
+                "requests": self.requests,
+                "waited": self.waited,
+                "wait_seconds_total": round(self.wait_seconds, 3)
+            }
+
+class LimitedTransport(httpx.BaseTransport):
+    """Keep-alive transport that caps concurrent in-flight requests and meters the wait."""
+
+    def __init__(self, max_in_flight):
+        self.metrics = PoolMetrics(max_in_flight)
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._transport = httpx.HTTPTransport(
+            limits=httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+        )
+
+    def handle_request(self, request):
+        queued = time.perf_counter()
+        self._slots.acquire()
+        self.metrics.started(time.perf_counter() - queued)
+        try:
+            return self._transport.handle_request(request)
+        finally:
+            self.metrics.finished()
+            self._slots.release()
+
+    def close(self):
+        self._transport.close()
+
+class LimitedAsyncTransport(httpx.AsyncBaseTransport):
+    """
+    Async twin of LimitedTransport, drawing on the same slots so LLM_MAX_IN_FLIGHT caps
+    sync and async requests together. Connections are bound to an event loop, so each
+    running loop (e.g. one asyncio.run per Celery task) gets its own pool; all loops
+    report into the same metrics.
+    """
+
+    def __init__(self, max_in_flight, metrics, slots):
+        self.max_in_flight = max_in_flight
+        self.metrics = metrics
+        self._slots = slots
+        self._per_loop = weakref.WeakKeyDictionary()
+
+    def _for_loop(self):
+        loop = asyncio.get_running_loop()
+        transport = self._per_loop.get(loop)
+        if transport is None:
+            transport = self._per_loop[loop] = httpx.AsyncHTTPTransport(limits=httpx.Limits(
+                max_connections=self.max_in_flight, max_keepalive_connections=self.max_in_flight
+            ))
+        return transport
+
+    async def _acquire(self):
+        # The slots are a threading semaphore shared with sync callers; polling keeps cancellation clean
+        delay = 0.005
+        while not self._slots.acquire(blocking=False):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.1)
+
+    async def handle_async_request(self, request):
+        transport = self._for_loop()
+        queued = time.perf_counter()
+        await self._acquire()
+        self.metrics.started(time.perf_counter() - queued)
+        try:
+            return await transport.handle_async_request(request)
+        finally:
+            self.metrics.finished()
+            self._slots.release()
+
+class ResponseCache(BaseCache):
+    """
+    Two-tier LangChain cache for deterministic (temperature=0) calls: an in-process
+    LRU in front of a persistent SQLite or Redis store. LangChain passes the
+    serialized model params as `llm_string`, so the key covers model, params and prompt.
+    """
+
+    def __init__(self, store=None, maxsize=512, ttl=86400):
+        self.memory = TTLCache(maxsize, ttl)
+        self.store = store
+        self.ttl = ttl
+        self.persistent_hits = 0
+
+    @staticmethod
+    def key(prompt, llm_string):
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode()).hexdigest()
+
+    def lookup(self, prompt, llm_string):
+        key = self.key(prompt, llm_string)
+        hit = self.memory.get(key)
+        if hit is not None: return hit
+        if self.store is None: return None
+        raw = self.store.get(key)
+        if raw is None: return None
+        generations = [loads(g) for g in json.loads(raw)]
+        self.persistent_hits += 1
+        self.memory.set(key, generations)
+        return generations
+
+    def update(self, prompt, llm_string, return_val):
+        key = self.key(prompt, llm_string)
+        self.memory.set(key, return_val)
+        if self.store is not None:
+            self.store.set(key, json.dumps([dumps(g) for g in return_val]), self.ttl)
+
+    def clear(self, **kwargs):
+        self.memory.clear()
+        if self.store is not None: self.store.clear()
+
+    def stats(self):
+        stats = self.memory.stats()
+        stats["persistent_hits"] = self.persistent_hits
+        stats["backend"] = type(self.store).__name__ if self.store else "memory"
+        return stats
+
+_lock = threading.Lock()
+_clients = {}
+_response_cache = None
+_transport = None
+_http = None
+_http_async = None
+_pid = None
+
+def _http_client():
+    """One keep-alive HTTP pool per process; sockets must not be shared across fork."""
+    global _transport, _http, _http_async, _pid
+    if _pid != os.getpid():
+        _transport = LimitedTransport(config.llm_max_in_flight)
+        _http = httpx.Client(transport=_transport, timeout=config.llm_timeout)
+        _http_async = httpx.AsyncClient(
+            transport=LimitedAsyncTransport(config.llm_max_in_flight, _transport.metrics, _transport._slots), timeout=config.llm_timeout
+        )
+        _pid = os.getpid()
+        _clients.clear()
+    return _http
+
+def get_response_cache():
+    global _response_cache
+    if _response_cache is None:
+        backend = config.llm_cache_backend
+        if backend == "redis": store = RedisStore(config.llm_cache_redis_url, prefix="deckforge:llm:")
+        elif backend == "sqlite": store = SQLiteStore(config.llm_cache_path)
+        else: store = None
+        _response_cache = ResponseCache(store, config.llm_cache_size, config.llm_cache_ttl)
+    return _response_cache
+
+def _openai(model, temperature, json_mode, cache):
     model_kwargs = {"response_format": {"type": "json_object"}} if json_mode else {}
     return ChatOpenAI(
-        model="gpt-4-turbo", 
-        temperature=0, 
+        model=model,
+        temperature=temperature,
         api_key=os.getenv("OPENAI_API_KEY"),
-        model_kwargs=model_kwargs
-    )
\ No newline at end of file
+        model_kwargs=model_kwargs,
+        http_client=_http_client(),
+        http_async_client=_http_async,
+        cache=cache
+    )
+
+def _fake(model, temperature, json_mode, cache):
+    from core.fake_llm import FakeChatModel
+    return FakeChatModel(
+        json_mode=json_mode,
+        latency=config.fake_llm_latency,
+        jitter=config.fake_llm_jitter,
+        error_rate=config.fake_llm_error_rate,
+        seed=config.fake_llm_seed,
+        cache=cache
+    )
+
+LLM_BACKENDS = {"openai": _openai, "fake": _fake}
+
+def register_llm_backend(name, factory):
+    """Registers a factory(model, temperature, json_mode, cache) returning a chat model."""
+    LLM_BACKENDS[name] = factory
+
+def get_llm(json_mode=False, model=None, temperature=None, cache=None, backend=None):
+    """
+    Returns a shared chat client per (backend, model, temperature, json_mode, cache); all
+    OpenAI clients share one HTTP pool. `cache` defaults to LLM_CACHE for temperature=0
+    calls; pass cache=False to bypass the response cache for one call.
+    """
+    backend = backend or config.llm_backend
+    if backend not in LLM_BACKENDS:
+        raise ValueError(f"Unknown LLM backend: {backend}")
+    model = model or config.llm_model
+    temperature = config.llm_temperature if temperature is None else temperature
+    if cache is None: cache = config.llm_cache and temperature == 0
+    key = (backend, model, temperature, json_mode, cache)
+    with _lock:
+        _http_client()
+        llm = _clients.get(key)
+        if llm is None:
+            llm = _clients[key] = LLM_BACKENDS[backend](
+                model, temperature, json_mode, get_response_cache() if cache else False
+            )
+            # Credits token usage to the instrumented node making the call
+            llm.callbacks = [*(llm.callbacks or []), usage_meter]
+    return llm
+
+def pool_stats():
+    """Client count plus in-flight/peak/queue-wait counters of the shared HTTP pool."""
+    with _lock:
+        _http_client()
+        stats = _transport.metrics.snapshot()
+        stats["clients"] = len(_clients)
+    if _response_cache is not None: stats["response_cache"] = _response_cache.stats()
+    return stats
@@ -1,31 +1,326 @@
-import os
-from langchain_community.document_loaders import DirectoryLoader, TextLoader, PyPDFLoader
-from langchain_openai import OpenAIEmbeddings
+import os, re, json, hashlib, threading
 from langchain_community.vectorstores import Chroma
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from core.config import config
+from core.ingest import LOADERS, ingest
+from core.embeddings import get_embedder
+from core.lexical import BM25Index, is_identifier_query, reciprocal_rank_fusion
+from utils.cache import TTLCache
+from utils.logger import logger
+
+MANIFEST_FILE = "manifest.json"
+LEXICAL_FILE = "lexical.json"
+COLLECTION_NAME = "corporate_memory"
+WARMING_POLICY = "Corporate standards index is still warming up; apply default security baselines."
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+def file_sha256(fp):
+    h = hashlib.sha256()
+    with open(fp, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+class IndexSnapshot:
+    """Immutable view of the index. Readers pin one for a whole retrieve() call."""
+
+    def __init__(self, manifest, lexical, version):
+        self.manifest = manifest
+        self.lexical = lexical
+        self.version = version
+        self.live_ids = frozenset(i for e in manifest.values() for i in e["chunks"])
 
 class CorporateMemory:
-    def __init__(self):
+    """
+    Persistent RAG index over the knowledge base.
+
+    Chunks live in a Chroma collection under `persist_dir`, next to a manifest
+    mapping each source file to its content hash and chunk ids, so a restart
+    only re-embeds files that were added, changed or removed since the last run.
+
+    Updates are copy-on-write: new chunks are added under fresh ids, a new
+    snapshot is published in one assignment and only then are stale chunks
+    deleted, so in-flight retrievals never see a half-applied update.
+    """
+
+    def __init__(self, persist_dir=None, embedder=None):
         self.vector_db = None
+        self.persist_dir = persist_dir or config.chroma_persist_dir
+        self.embedder = embedder
+        self.kb_path = None
+        self.retrieval_cache = TTLCache(config.retrieval_cache_size, config.retrieval_cache_ttl)
+        self.warm_error = None
+        self._snapshot = IndexSnapshot({}, BM25Index(), None)
+        self._write_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._warm_lock = threading.Lock()
+        self._warm_thread = None
+        self._owner_pid = None
+        self._watch_thread = None
+        self._watch_stop = threading.Event()
+
+    @property
+    def manifest(self):
+        return self._snapshot.manifest
+
+    @property
+    def lexical(self):
+        return self._snapshot.lexical
+
+    @property
+    def index_version(self):
+        return self._snapshot.version
+
+    def warm(self, path=None, background=True):
+        """Starts indexing once per process; returns the warm-up thread."""
+        with self._warm_lock:
+            # Threads don't survive fork (Celery prefork), so children start their own
+            if self._owner_pid != os.getpid():
+                self._owner_pid = os.getpid()
+                self._warm_thread = None
+                self._watch_thread = None
+            if self._warm_thread is None or (self.warm_error and not self._warm_thread.is_alive()):
+                self._ready = threading.Event()
+                self.warm_error = None
+                self._warm_thread = threading.Thread(
+                    target=self._warm, args=(path or config.knowledge_base_path, self._ready),
+                    name="memory-warmup", daemon=True
+                )
+                self._warm_thread.start()
+            thread = self._warm_thread
+        if not background: thread.join()
+        return thread
+
+    def _warm(self, path, ready):
+        try:
+            self.initialize(path)
+            if config.memory_watch: self.watch(path)
+        except Exception as e:
+            self.warm_error = e
+        finally:
+            ready.set()
+
+    def ensure_ready(self, timeout=None) -> bool:
+        """Blocks until the index is hot (or `timeout` elapses). Kicks off warm-up if cold."""
+        self.warm()
+        return self._ready.wait(timeout) and self.warm_error is None
+
+    @property
+    def is_ready(self) -> bool:
+        return self._owner_pid == os.getpid() and self._ready.is_set() and self.warm_error is None
+
+    def status(self) -> dict:
+        if self._owner_pid != os.getpid() or self._warm_thread is None: state = "cold"
+        elif not self._ready.is_set(): state = "warming"
+        else: state = "failed" if self.warm_error else "ready"
+        return {
+            "state": state,
+            "files": len(self.manifest),
+            "index_version": self.index_version,
+            "watching": bool(self._watch_thread and self._watch_thread.is_alive()),
+            "retrieval_cache": self.retrieval_cache.stats(),
+            "error": str(self.warm_error) if self.warm_error else None
+        }
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.persist_dir, MANIFEST_FILE)
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        # A different embedding model makes every stored vector incomparable
+        if data.get("embedding_model") != self.embedder.model_id: return {}
+        return data.get("files", {})
+
+    def _save_manifest(self, manifest):
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"embedding_model": self.embedder.model_id, "files": manifest}, f, indent=1)
+        os.replace(tmp, self.manifest_path)
+
+    def _scan(self, path):
+        """Returns {relative path: absolute path} for every indexable file."""
+        found = {}
+        for root, _, files in os.walk(path):
+            for name in files:
+                if os.path.splitext(name)[1].lower() in LOADERS:
+                    fp = os.path.join(root, name)
+                    found[os.path.relpath(fp, path).replace(os.sep, "/")] = fp
+        return found
+
+    def _fingerprint(self, manifest, rel, fp):
+        """Returns (sha256, mtime, size); skips hashing when mtime and size are unchanged."""
+        st = os.stat(fp)
+        entry = manifest.get(rel)
+        if entry and entry.get("mtime") == st.st_mtime and entry.get("size") == st.st_size:
+            return entry["sha256"], st.st_mtime, st.st_size
+        return file_sha256(fp), st.st_mtime, st.st_size
+
+    def _load_lexical(self, manifest):
+        lexical = BM25Index.load(os.path.join(self.persist_dir, LEXICAL_FILE))
+        known = {i for e in manifest.values() for i in e["chunks"]}
+        if set(lexical.texts) != known:
+            # Missing or out of sync with the collection: rebuild from the stored chunks
+            lexical = BM25Index()
+            if known:
+                got = self.vector_db.get(ids=list(known))
+                for i, text in zip(got["ids"], got["documents"]): lexical.add(i, text)
+        return lexical
+
+    def _version(self, manifest):
+        digest = hashlib.sha256(self.embedder.model_id.encode())
+        for rel in sorted(manifest):
+            digest.update(f"{rel}:{manifest[rel]['sha256']}\n".encode())
+        return digest.hexdigest()[:16]
 
     def initialize(self, path="knowledge_base"):
         if not os.path.exists(path): os.makedirs(path)
-        loaders = [
-            DirectoryLoader(path, glob="**/*.md", loader_cls=TextLoader),
-            DirectoryLoader(path, glob="**/*.pdf", loader_cls=PyPDFLoader)
-        ]
-        docs = []
-        for l in loaders: docs.extend(l.load())
-        if docs:
-            splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-            self.vector_db = Chroma.from_documents(
-                documents=splitter.split_documents(docs),
-                embedding=OpenAIEmbeddings()
+        os.makedirs(self.persist_dir, exist_ok=True)
+        if self.embedder is None: self.embedder = get_embedder()
+        manifest = self._load_manifest()
+        if not manifest and os.path.exists(self.persist_dir):
+            # Stale or foreign collection: start from a clean slate
+            Chroma(collection_name=COLLECTION_NAME, persist_directory=self.persist_dir).delete_collection()
+        self.vector_db = Chroma(
+            collection_name=COLLECTION_NAME,
+            embedding_function=self.embedder,
+            persist_directory=self.persist_dir
+        )
+        snapshot = IndexSnapshot(manifest, self._load_lexical(manifest), self._version(manifest))
+        # Chunks left behind by an interrupted refresh are not in the manifest
+        orphans = [i for i in self.vector_db.get(include=[])["ids"] if i not in snapshot.live_ids]
+        if orphans: self.vector_db.delete(ids=orphans)
+        self._snapshot = snapshot
+        self.kb_path = path
+        return self.refresh(path)
+
+    def refresh(self, path=None):
+        """Applies added, changed and removed files to the live index without blocking readers."""
+        with self._write_lock:
+            path = path or self.kb_path
+            old = self._snapshot
+            manifest = dict(old.manifest)
+            current = {rel: (fp,) + self._fingerprint(manifest, rel, fp) for rel, fp in self._scan(path).items()}
+            stats = {"added": 0, "changed": 0, "removed": 0, "unchanged": 0}
+            lexical, stale_ids = None, []
+
+            for rel in list(manifest):
+                if rel in current and current[rel][1] == manifest[rel]["sha256"]:
+                    stats["unchanged"] += 1
+                    # Keep the cheap mtime/size fingerprint fresh (e.g. after a touch)
+                    manifest[rel] = dict(manifest[rel], mtime=current[rel][2], size=current[rel][3])
+                    continue
+                stale_ids.extend(manifest.pop(rel)["chunks"])
+                stats["changed" if rel in current else "removed"] += 1
+
+            jobs = [(rel, fp, digest) for rel, (fp, digest, _, _) in current.items() if rel not in manifest]
+            if jobs or stale_ids:
+                lexical = old.lexical.copy()
+                for i in stale_ids: lexical.remove(i)
+
+            def sink(batch):
+                docs, ids = [], []
+                for _, chunks, chunk_ids in batch:
+                    docs.extend(chunks)
+                    ids.extend(chunk_ids)
+                for i in range(0, len(docs), config.ingest_batch_size):
+                    self.vector_db.add_documents(docs[i:i + config.ingest_batch_size], ids=ids[i:i + config.ingest_batch_size])
+                for c, i in zip(docs, ids): lexical.add(i, c.page_content)
+                for rel, _, chunk_ids in batch:
+                    _, digest, mtime, size = current[rel]
+                    manifest[rel] = {"sha256": digest, "chunks": chunk_ids, "mtime": mtime, "size": size}
+                # Resumable: after a crash, stale chunks are swept as orphans on the next initialize()
+                self._save_manifest(manifest)
+
+            stats["ingest"] = ingest(
+                jobs, sink, batch_size=config.ingest_batch_size, workers=config.ingest_workers,
+                progress=lambda r: logger.info(
+                    f"Knowledge base ingest: {r['files']}/{r['total_files']} files, {r['chunks']} chunks "
+                    f"({r['files_per_s']} files/s, {r['chunks_per_s']} chunks/s)"
+                )
             )
+            stats["added"] = len(current) - stats["unchanged"] - stats["changed"]
+
+            # Publish first, then drop stale chunks: a reader holds either the old or the new snapshot
+            version = self._version(manifest)
+            self._snapshot = IndexSnapshot(manifest, old.lexical if lexical is None else lexical, version)
+            if version != old.version: self.retrieval_cache.clear()
+            if stale_ids: self.vector_db.delete(ids=stale_ids)
+            self._save_manifest(manifest)
+            if lexical is not None: lexical.save(os.path.join(self.persist_dir, LEXICAL_FILE))
+            return stats
+
+    def watch(self, path=None, interval=None):
+        """Polls the knowledge base and hot-applies changes to the live index."""
+        if self._watch_thread and self._watch_thread.is_alive(): return self._watch_thread
+        path = path or self.kb_path or config.knowledge_base_path
+        interval = interval or config.memory_watch_interval
+        self._watch_stop = stop = threading.Event()
+
+        def loop():
+            while not stop.wait(interval):
+                try:
+                    stats = self.refresh(path)
+                    if stats["added"] or stats["changed"] or stats["removed"]:
+                        logger.info(
+                            f"Knowledge base updated: +{stats['added']} ~{stats['changed']} -{stats['removed']} "
+                            f"(index {self.index_version})"
+                        )
+                except Exception as e:
+                    logger.error(f"Knowledge base refresh failed: {e}")
+
+        self._watch_thread = threading.Thread(target=loop, name="memory-watch", daemon=True)
+        self._watch_thread.start()
+        return self._watch_thread
+
+    def stop_watching(self):
+        self._watch_stop.set()
+        if self._watch_thread: self._watch_thread.join()
+        self._watch_thread = None
+
+    @staticmethod
+    def _lexical_ids(snap, query, n):
+        # Like vector hits, BM25 hits only count when the snapshot's manifest still lists them
+        return [i for i, _ in snap.lexical.search(query, n) if i in snap.live_ids]
+
+    def _search(self, snap, query, k, mode):
+        # Exact IDs / CIDRs / resource names: answer from BM25 without an embedding call
+        pool = max(k * 4, 10)
+        if mode == "lexical" or (mode == "hybrid" and is_identifier_query(query)):
+            hits = self._lexical_ids(snap, query, pool)[:k]
+            if hits or mode == "lexical":
+                return [snap.lexical.texts[i] for i in hits]
+
+        # Over-fetch vector hits and drop chunks that aren't part of this snapshot
+        texts, vector_ids = {}, []
+        for d in self.vector_db.similarity_search(query, k=pool):
+            i = d.metadata.get("chunk_id")
+            if i not in snap.live_ids: continue
+            texts[i] = d.page_content
+            vector_ids.append(i)
+        if mode == "vector":
+            return [texts[i] for i in vector_ids[:k]]
+
+        lexical_ids = self._lexical_ids(snap, query, pool)
+        ranked = reciprocal_rank_fusion(lexical_ids, vector_ids)[:k]
+        return [texts.get(i) or snap.lexical.texts[i] for i in ranked]
 
-    def retrieve(self, query: str) -> str:
-        if not self.vector_db: return "No specific policies found."
-        docs = self.vector_db.similarity_search(query, k=2)
-        return "\n".join([d.page_content for d in docs])
+    def retrieve(self, query: str, k: int = 2, mode: str = None) -> str:
+        """Returns the top-k policy chunks. `mode` is vector, lexical or hybrid (default from config)."""
+        snap = self._snapshot
+        if not self.vector_db or not snap.live_ids:
+            return "No specific policies found."
+        mode = mode or config.retrieval_mode
+        key = (snap.version, mode, k, normalize_query(query))
+        cached = self.retrieval_cache.get(key)
+        if cached is not None: return cached
+        result = "\n".join(self._search(snap, query, k, mode))
+        self.retrieval_cache.set(key, result)
+        return result
 
-memory = CorporateMemory()
\ No newline at end of file
+memory = CorporateMemory()
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Dict, Any, Optional, Literal
+from typing import List, Dict, Any, Optional, Literal, Annotated
 from datetime import datetime
+import operator
 
 class AppConfig(BaseModel):
     enabled: bool = False
@@ -16,6 +17,7 @@ class ValidationResult(BaseModel):
     tool: str
     status: Literal["PASS", "FAIL"]
     stderr: str = ""
+    duration_s: float = 0.0
 
 class LiveResource(BaseModel):
     address: str
@@ -44,6 +46,17 @@ class IncidentContext(BaseModel):
     severity: str
     status: str
 
+class NodeMetric(BaseModel):
+    graph: str
+    node: str
+    wall_s: float
+    cpu_s: Optional[float] = None
+    tokens_in: int = 0
+    tokens_out: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    error: Optional[str] = None
+
 class AgentState(BaseModel):
     thread_id: str
     user_idea: str
@@ -51,6 +64,9 @@ class AgentState(BaseModel):
     retrieved_policy: str = ""
     current_blueprint: Optional[InfraBlueprint] = None
     artifacts: Dict[str, str] = {}
+    # Incremental re-render: dependency fingerprint per artifact, and what the last forge changed
+    artifact_fingerprints: Dict[str, str] = {}
+    changed_artifacts: List[str] = []
     diagram_code: str = ""
     validation_results: List[ValidationResult] = []
     deployment_url: Optional[str] = None
@@ -59,6 +75,8 @@ class AgentState(BaseModel):
     live_resources: List[LiveResource] = []
     # Phase 9: Incident context
     current_incident: Optional[IncidentContext] = None
+    # Instrumentation: one entry per node run, appended across parallel branches
+    node_metrics: Annotated[List[NodeMetric], operator.add] = []
 
 # Additional classes for TUI
 class AgentTask(BaseModel):
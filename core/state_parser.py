@@ -1,12 +1,141 @@
-import subprocess
 import json
 import os
+import re
+from core.config import config
+from core.hcl import tokenize, HCLSyntaxError
+from core.validator import terraform_runner
+from utils.cache import TTLCache
+from utils.logger import logger
+
+STATE_FILE = "terraform.tfstate"
+MODULE_SEGMENT_RE = re.compile(r'module\.[^.\[]+(?:\[(?:"(?:[^"\\]|\\.)*"|\d+)\])?')
+
+# Parsed records per (state path, mtime, size): the drift schedule re-reads unchanged files
+_parsed = TTLCache(maxsize=1024, ttl=None)
+
+class UnsupportedState(Exception):
+    """The state is somewhere or in a format only the terraform CLI can read."""
+
+def _address(resource, instance):
+    address = f"{resource['type']}.{resource['name']}"
+    if resource.get("mode") == "data": address = f"data.{address}"
+    if resource.get("module"): address = f"{resource['module']}.{address}"
+    key = instance.get("index_key")
+    if isinstance(key, int): address += f"[{key}]"
+    elif key is not None: address += f"[{json.dumps(key)}]"
+    return address
+
+def _parent(module):
+    return ".".join(MODULE_SEGMENT_RE.findall(module)[:-1])
+
+def parse_state(raw):
+    """
+    Resource records from a version 4 state document, in the order `terraform show
+    -json` lists them: each module's resources sorted by address, then its child
+    modules sorted by address. Deposed objects are skipped, as show does.
+    """
+    try:
+        state = json.loads(raw)
+    except ValueError as e:
+        raise UnsupportedState(f"not JSON: {e}")
+    if not isinstance(state, dict) or state.get("version") != 4:
+        raise UnsupportedState(f"state version {state.get('version') if isinstance(state, dict) else '?'}")
+
+    by_module = {}
+    for r in state.get("resources", []):
+        for instance in r.get("instances", []):
+            if instance.get("deposed"): continue
+            by_module.setdefault(r.get("module", ""), []).append({
+                "address": _address(r, instance),
+                "type": r["type"],
+                "status": (instance.get("attributes") or {}).get("instance_state", "unknown")
+            })
+
+    children = {}
+    for module in list(by_module):
+        while module:
+            children.setdefault(_parent(module), set()).add(module)
+            module = _parent(module)
+
+    records = []
+    def walk(module):
+        records.extend(sorted(by_module.get(module, []), key=lambda r: r["address"]))
+        for child in sorted(children.get(module, ())): walk(child)
+    walk("")
+    return records
+
+def backend(tf_dir):
+    """(type, {argument: string value}) of the backend block in the configuration, or (None, {}) when there is none."""
+    for name in sorted(os.listdir(tf_dir)):
+        if not name.endswith(".tf"): continue
+        try:
+            with open(os.path.join(tf_dir, name)) as f:
+                tokens = tokenize(f.read())
+        except HCLSyntaxError:
+            continue
+        for i, t in enumerate(tokens[:-1]):
+            if t.kind != "ident" or t.value != "backend" or tokens[i + 1].kind != "string": continue
+            kind, settings = tokens[i + 1].value, {}
+            body = tokens[i + 3:]
+            for k, x in enumerate(body[:-2]):
+                if x.depth <= t.depth: break
+                if x.kind == "ident" and x.depth == t.depth + 1 and body[k + 1].value == "=" and body[k + 2].kind == "string":
+                    settings[x.value] = body[k + 2].value
+            return kind, settings
+    return None, {}
 
 class StateParser:
     def __init__(self, project_dir: str):
         self.wd = project_dir
 
+    def state_path(self):
+        """
+        Where this project's state lives: TERRAFORM_STATE_PATH (with {project}
+        substituted) when set; else for the default workspace the local backend's
+        `path` or terraform.tfstate, and for any other workspace
+        <workspace_dir>/<workspace>/terraform.tfstate. Raises UnsupportedState for
+        remote backends.
+        """
+        tf_dir = os.path.join(self.wd, "terraform")
+        if config.terraform_state_path:
+            return config.terraform_state_path.format(project=os.path.basename(os.path.normpath(self.wd)))
+        kind, settings = backend(tf_dir) if os.path.isdir(tf_dir) else (None, {})
+        if kind not in (None, "local"): raise UnsupportedState(f"{kind} backend")
+        workspace = os.getenv("TF_WORKSPACE")
+        env_file = os.path.join(tf_dir, ".terraform", "environment")
+        if not workspace and os.path.exists(env_file):
+            with open(env_file) as f:
+                workspace = f.read().strip()
+        # The local backend's `path` only applies to the default workspace
+        if workspace and workspace != "default":
+            return os.path.join(tf_dir, settings.get("workspace_dir", "terraform.tfstate.d"), workspace, STATE_FILE)
+        return os.path.join(tf_dir, settings.get("path", STATE_FILE))
+
+    def read_state(self, path):
+        st = os.stat(path)
+        key = (path, st.st_mtime_ns, st.st_size)
+        records = _parsed.get(key)
+        if records is None:
+            with open(path) as f:
+                records = parse_state(f.read())
+            _parsed.set(key, records)
+        return [dict(r) for r in records]
+
     def get_live_resources(self):
+        """Reads the state file directly; terraform show is spawned for any state it cannot read."""
+        try:
+            path = self.state_path()
+            if not os.path.exists(path): return []
+            return self.read_state(path)
+        except FileNotFoundError:
+            return []
+        except UnsupportedState as e:
+            logger.info(f"Reading state of {self.wd} through terraform show ({e})")
+        except Exception as e:
+            logger.warning(f"Could not read state of {self.wd} directly, using terraform show: {e}")
+        return self.show()
+
+    def show(self):
         """Runs terraform show to get reality."""
         tf_dir = os.path.join(self.wd, "terraform")
         if not os.path.exists(os.path.join(tf_dir, ".terraform")):
@@ -14,17 +143,12 @@ class StateParser:
 
         try:
             # Security: Ensure we don't leak secrets to logs
-            res = subprocess.run(
-                ["terraform", "show", "-json"], 
-                cwd=tf_dir, 
-                capture_output=True, 
-                text=True
-            )
+            res = terraform_runner.run([config.terraform_binary, "show", "-json"], cwd=tf_dir)
             if res.returncode != 0: return []
-            
+
             state = json.loads(res.stdout)
             resources = []
-            
+
             # Recursive parser for modules
             def extract(modules):
                 for m in modules:
@@ -35,10 +159,10 @@ class StateParser:
                             "status": r.get("values", {}).get("instance_state", "unknown")
                         })
                     extract(m.get("child_modules", []))
-            
+
             if "values" in state:
                 extract([state["values"]["root_module"]])
-                
+
             return resources
         except Exception:
-            return []
\ No newline at end of file
+            return []
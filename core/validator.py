@@ -1,12 +1,544 @@
-import subprocess, os, shutil
+import asyncio, os, re, json, time, fcntl, shutil, hashlib, fnmatch, threading
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+import yaml
+from core.config import config
+from core.schema import ValidationResult
+from core.hcl import check_terraform, format_issues
+from utils.cache import SQLiteStore, RedisStore
+from utils.logger import logger
+from utils.process import ProcessRunner
+from utils.pool import SharedPool
+
+# terraform's working data and state never affect `validate`
+IGNORED_DIRS = {".terraform"}
+
+# Every terraform invocation goes through this: bounded concurrency, timeouts, rlimits
+terraform_runner = ProcessRunner(
+    "terraform",
+    max_concurrent=config.terraform_max_concurrent,
+    timeout=config.terraform_timeout,
+    cpu_seconds=config.terraform_cpu_limit,
+    memory_mb=config.terraform_memory_limit_mb
+)
+
+_cache_lock = threading.Lock()
+_cache = None
+_cache_stats = {"hits": 0, "misses": 0}
+
+def terraform_digest(tf_path):
+    """Hash of the configuration terraform validates, including the provider lock file."""
+    h = hashlib.sha256(config.terraform_binary.encode())
+    for root, dirs, files in os.walk(tf_path):
+        dirs[:] = sorted(d for d in dirs if d not in IGNORED_DIRS)
+        for name in sorted(files):
+            if name.startswith("terraform.tfstate"): continue
+            fp = os.path.join(root, name)
+            h.update(os.path.relpath(fp, tf_path).encode() + b"\0")
+            with open(fp, "rb") as f:
+                h.update(hashlib.sha256(f.read()).digest())
+    return h.hexdigest()
+
+def get_validation_cache():
+    """Store shared by all workers (sqlite on one host, redis across hosts), or None when disabled."""
+    global _cache
+    if not config.validation_cache: return None
+    with _cache_lock:
+        if _cache is None:
+            if config.validation_cache_backend == "redis":
+                _cache = RedisStore(config.validation_cache_redis_url, prefix="deckforge:validate:")
+            else:
+                _cache = SQLiteStore(config.validation_cache_path, table="validations")
+        return _cache
+
+def validation_cache_stats():
+    with _cache_lock:
+        stats = dict(_cache_stats)
+    total = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / total, 4) if total else 0.0
+    return stats
+
+def _cached(key):
+    cache = get_validation_cache()
+    raw = cache.get(key) if cache else None
+    with _cache_lock:
+        _cache_stats["hits" if raw is not None else "misses"] += 1
+    if raw is None: return None
+    status, stderr = json.loads(raw)
+    return status, stderr
+
+def _store(key, status, stderr):
+    cache = get_validation_cache()
+    if cache: cache.set(key, json.dumps([status, stderr]), config.validation_cache_ttl)
+
+LOCK_FILE = ".terraform.lock.hcl"
+MODULE_RE = re.compile(r'^\s*module\s+"', re.MULTILINE)
+REQUIRED_PROVIDERS_RE = re.compile(r"required_providers\s*\{")
+
+def _tf_sources(tf_path):
+    sources = []
+    for name in sorted(os.listdir(tf_path)):
+        if name.endswith(".tf"):
+            with open(os.path.join(tf_path, name)) as f:
+                sources.append(f.read())
+    return sources
+
+def required_providers(source):
+    """The body of the first required_providers block, or None."""
+    match = REQUIRED_PROVIDERS_RE.search(source)
+    if not match: return None
+    depth, i = 1, match.end()
+    while i < len(source) and depth:
+        depth += {"{": 1, "}": -1}.get(source[i], 0)
+        i += 1
+    return source[match.start():i] if depth == 0 else None
+
+class TerraformWorkspaces:
+    """
+    Provider installs shared by every project: one TF_PLUGIN_CACHE_DIR, and one
+    pre-initialized data dir plus lock file per distinct required_providers block.
+    Projects validate against that data dir (TF_DATA_DIR), so a new project needs
+    no `terraform init` and gets nothing but the lock file written into its tree.
+    """
+
+    def __init__(self, root=None):
+        self._root = root
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    @property
+    def root(self):
+        return os.path.abspath(self._root or config.terraform_workspace_dir)
+
+    def env(self, data_dir=None):
+        plugin_cache = os.path.join(self.root, "plugins")
+        os.makedirs(plugin_cache, exist_ok=True)
+        env = {**os.environ, "TF_PLUGIN_CACHE_DIR": plugin_cache, "TF_IN_AUTOMATION": "1"}
+        if data_dir: env["TF_DATA_DIR"] = data_dir
+        return env
+
+    def _lock(self, sig):
+        with self._guard:
+            return self._locks.setdefault(sig, threading.Lock())
+
+    def _plugin_cache_lock(self):
+        os.makedirs(self.root, exist_ok=True)
+        return open(os.path.join(self.root, "plugins.lock"), "w")
+
+    def init(self, cwd, env):
+        """
+        Runs `terraform init` while holding the host-wide plugin cache lock: terraform
+        does not support concurrent installs into one TF_PLUGIN_CACHE_DIR, across
+        threads or worker processes.
+        """
+        with self._plugin_cache_lock() as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            return terraform_runner.run([config.terraform_binary, "init", "-backend=false"], cwd=cwd, env=env)
+
+    async def ainit(self, cwd, env):
+        """Async twin of init(); waits for the lock on a worker thread."""
+        with self._plugin_cache_lock() as lock:
+            await asyncio.to_thread(fcntl.flock, lock, fcntl.LOCK_EX)
+            return await terraform_runner.arun([config.terraform_binary, "init", "-backend=false"], cwd=cwd, env=env)
+
+    def workspace(self, block):
+        """Returns the initialized workspace dir for a required_providers block, or None if init failed."""
+        sig = hashlib.sha256(f"{config.terraform_binary}\0{block}".encode()).hexdigest()[:16]
+        ws = os.path.join(self.root, "workspaces", sig)
+        ready, failed = os.path.join(ws, ".ready"), os.path.join(ws, ".failed")
+        if os.path.exists(ready): return ws
+        if self._failed_recently(failed): return None
+        with self._lock(sig):
+            os.makedirs(ws, exist_ok=True)
+            # Other worker processes may be initializing the same workspace
+            with open(os.path.join(ws, ".init.lock"), "w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                if os.path.exists(ready): return ws
+                if self._failed_recently(failed): return None
+                with open(os.path.join(ws, "versions.tf"), "w") as f:
+                    f.write(f"terraform {{\n  {block}\n}}\n")
+                data_dir = os.path.join(ws, ".terraform")
+                res = self.init(ws, self.env(data_dir))
+                if res.returncode != 0:
+                    logger.warning(f"Terraform workspace init failed{' (timed out)' if res.timed_out else ''}: {res.stderr.strip()[:500]}")
+                    open(failed, "w").close()
+                    return None
+                open(ready, "w").close()
+        return ws
+
+    @staticmethod
+    def _failed_recently(marker):
+        # A failed init is not retried on every validation; projects init on their own meanwhile
+        try:
+            return time.time() - os.path.getmtime(marker) < config.terraform_workspace_retry_after
+        except FileNotFoundError:
+            return False
+
+    @staticmethod
+    def _shared_block(tf_path):
+        """The required_providers block a project can borrow a workspace for, or None."""
+        sources = _tf_sources(tf_path)
+        if any(MODULE_RE.search(src) for src in sources): return None
+        return next((b for b in map(required_providers, sources) if b), None)
+
+    def validation_key(self, tf_path):
+        """
+        Cache key known before anything is initialized: the tree's digest and, for a
+        project that will borrow a workspace's lock file, the required_providers
+        block that lock file is resolved from.
+        """
+        key = terraform_digest(tf_path)
+        if os.path.exists(os.path.join(tf_path, LOCK_FILE)): return key
+        block = self._shared_block(tf_path)
+        return key if block is None else hashlib.sha256(f"{key}\0{block}".encode()).hexdigest()
+
+    def prepare(self, tf_path):
+        """
+        Points a project at its shared workspace and returns the env to validate with,
+        or None when the project needs its own `terraform init` (modules, no
+        required_providers block, or a lock file of its own that differs).
+        """
+        block = self._shared_block(tf_path)
+        if block is None: return None
+        ws = self.workspace(block)
+        if ws is None: return None
+        shared_lock, own_lock = os.path.join(ws, LOCK_FILE), os.path.join(tf_path, LOCK_FILE)
+        if not os.path.exists(shared_lock): return None
+        if not os.path.exists(own_lock):
+            shutil.copyfile(shared_lock, own_lock)
+        else:
+            with open(own_lock) as a, open(shared_lock) as b:
+                if a.read() != b.read(): return None
+        return self.env(os.path.join(ws, ".terraform"))
+
+workspaces = TerraformWorkspaces()
+
+def _verdict(res, command):
+    if res.timed_out: return "FAIL", f"terraform {command} timed out after {res.duration_s:.0f}s and was killed\n{res.stderr}"
+    return ("PASS", "") if res.returncode == 0 else ("FAIL", res.stderr)
 
 class CodeValidator:
     def validate_terraform(self, project_path):
         tf_path = os.path.join(project_path, "terraform")
         if not os.path.exists(tf_path): return "PASS", ""
         try:
-            subprocess.run(["terraform", "init", "-backend=false"], cwd=tf_path, capture_output=True)
-            res = subprocess.run(["terraform", "validate"], cwd=tf_path, capture_output=True, text=True)
-            return ("PASS", "") if res.returncode == 0 else ("FAIL", res.stderr)
+            if config.terraform_precheck:
+                issues = check_terraform(tf_path)
+                if issues: return "FAIL", format_issues(issues)
+            # A cached verdict needs no workspace, so a cold host skips its init entirely
+            key = workspaces.validation_key(tf_path)
+            hit = _cached(key)
+            if hit: return hit
+            env = workspaces.prepare(tf_path)
+            init_ok = True
+            if env is None:
+                env = workspaces.env()
+                init = workspaces.init(tf_path, env)
+                init_ok = init.returncode == 0
+            res = terraform_runner.run([config.terraform_binary, "validate"], cwd=tf_path, env=env)
+            status, err = _verdict(res, "validate")
+            # A failed init (network, locks) or a killed validate says nothing about the configuration
+            if init_ok and not res.timed_out:
+                # init may have written a lock file; re-validating this tree then hashes differently
+                for k in {key, terraform_digest(tf_path)}: _store(k, status, err)
+            return status, err
+        except Exception as e:
+            return "FAIL", str(e)
+
+    async def avalidate_terraform(self, project_path):
+        """Non-blocking twin of validate_terraform for the async graph."""
+        tf_path = os.path.join(project_path, "terraform")
+        if not os.path.exists(tf_path): return "PASS", ""
+        try:
+            if config.terraform_precheck:
+                issues = await asyncio.to_thread(check_terraform, tf_path)
+                if issues: return "FAIL", format_issues(issues)
+            key = await asyncio.to_thread(workspaces.validation_key, tf_path)
+            hit = await asyncio.to_thread(_cached, key)
+            if hit: return hit
+            env = await asyncio.to_thread(workspaces.prepare, tf_path)
+            init_ok = True
+            if env is None:
+                env = workspaces.env()
+                init = await workspaces.ainit(tf_path, env)
+                init_ok = init.returncode == 0
+            res = await terraform_runner.arun([config.terraform_binary, "validate"], cwd=tf_path, env=env)
+            status, err = _verdict(res, "validate")
+            if init_ok and not res.timed_out:
+                for k in {key, await asyncio.to_thread(terraform_digest, tf_path)}:
+                    await asyncio.to_thread(_store, k, status, err)
+            return status, err
         except Exception as e:
-            return "FAIL", str(e)
\ No newline at end of file
+            return "FAIL", str(e)
+
+# --- Lint checks for the non-terraform artifacts; each returns (status, stderr) ---
+
+def _load_yaml(name, src, errors):
+    try:
+        return yaml.safe_load(src)
+    except yaml.YAMLError as e:
+        errors.append(f"{name}: invalid YAML: {e}")
+        return None
+
+TASK_KEYWORDS = {
+    "name", "when", "become", "become_user", "become_method", "register", "notify", "listen", "tags",
+    "loop", "loop_control", "ignore_errors", "ignore_unreachable", "changed_when", "failed_when", "vars",
+    "environment", "delegate_to", "delegate_facts", "run_once", "args", "no_log", "until", "retries",
+    "delay", "check_mode", "diff", "timeout", "any_errors_fatal", "collections", "connection", "debugger",
+    "module_defaults", "throttle", "async", "poll", "block", "rescue", "always", "local_action", "action"
+}
+TASK_LISTS = ("pre_tasks", "roles", "tasks", "post_tasks", "handlers")
+
+def _task_errors(where, tasks):
+    if not isinstance(tasks, list): return [f"{where}: expected a list of tasks"]
+    errors = []
+    for i, task in enumerate(tasks):
+        at = f"{where}[{i}]"
+        if not isinstance(task, dict):
+            errors.append(f"{at}: a task must be a mapping")
+            continue
+        if "block" in task:
+            for key in ("block", "rescue", "always"):
+                if key in task: errors += _task_errors(f"{at}.{key}", task[key])
+            continue
+        actions = [k for k in task if k not in TASK_KEYWORDS and not k.startswith("with_")]
+        if "action" in task or "local_action" in task: actions.append("action")
+        if not actions: errors.append(f"{at}: no module/action detected in task {task.get('name', '')!r}")
+        elif len(actions) > 1: errors.append(f"{at}: conflicting action statements: {', '.join(actions)}")
+    return errors
+
+def check_ansible(project_path, files):
+    """YAML syntax plus playbook shape: a list of plays with hosts and well-formed task lists."""
+    errors = []
+    for name, src in sorted(files.items()):
+        plays = _load_yaml(name, src, errors)
+        if plays is None: continue
+        if not isinstance(plays, list):
+            errors.append(f"{name}: a playbook must be a list of plays")
+            continue
+        for i, play in enumerate(plays):
+            if not isinstance(play, dict):
+                errors.append(f"{name}: play {i} must be a mapping")
+            elif "import_playbook" in play or "ansible.builtin.import_playbook" in play:
+                continue
+            elif "hosts" not in play:
+                errors.append(f"{name}: play {i} has no 'hosts'")
+            else:
+                for key in TASK_LISTS:
+                    if key in play and key != "roles": errors += _task_errors(f"{name}: play {i} {key}", play[key])
+    return ("FAIL", "\n".join(errors)) if errors else ("PASS", "")
+
+DOCKERFILE_INSTRUCTIONS = {
+    "FROM", "RUN", "CMD", "LABEL", "MAINTAINER", "EXPOSE", "ENV", "ADD", "COPY", "ENTRYPOINT",
+    "VOLUME", "USER", "WORKDIR", "ARG", "ONBUILD", "STOPSIGNAL", "HEALTHCHECK", "SHELL"
+}
+
+def _dockerfile_instructions(src):
+    """(line number, INSTRUCTION, arguments), with continuation lines joined."""
+    out, buf, start = [], "", None
+    for n, raw in enumerate(src.splitlines(), 1):
+        line = raw.strip()
+        if not buf and (not line or line.startswith("#")): continue
+        if buf and line.startswith("#"): continue
+        if start is None: start = n
+        if line.endswith("\\"):
+            buf += line[:-1] + " "
+            continue
+        text = (buf + line).strip()
+        keyword, _, args = text.partition(" ")
+        out.append((start, keyword.upper(), args.strip()))
+        buf, start = "", None
+    if buf:
+        keyword, _, args = buf.strip().partition(" ")
+        out.append((start, keyword.upper(), args.strip()))
+    return out
+
+def check_dockerfile(project_path, files):
+    """
+    Dockerfile lint: unknown or empty instructions and a missing leading FROM fail;
+    unpinned base images, MAINTAINER and non-interactive apt-get installs are warnings.
+    """
+    errors, warnings = [], []
+    for name, src in sorted(files.items()):
+        instructions = _dockerfile_instructions(src)
+        first = next((i for i in instructions if i[1] != "ARG"), None)
+        if first is None or first[1] != "FROM":
+            errors.append(f"{name}: the first instruction must be FROM")
+        for line, keyword, args in instructions:
+            at = f"{name}:{line}"
+            if keyword not in DOCKERFILE_INSTRUCTIONS:
+                errors.append(f"{at}: unknown instruction {keyword}")
+            elif not args:
+                errors.append(f"{at}: {keyword} requires at least one argument")
+            elif keyword == "FROM":
+                image = args.split()[0]
+                if image != "scratch" and "$" not in image and "@" not in image:
+                    tag = image.rsplit("/", 1)[-1].partition(":")[2]
+                    if not tag or tag == "latest": warnings.append(f"{at}: pin the base image version ({image})")
+            elif keyword == "MAINTAINER":
+                warnings.append(f"{at}: MAINTAINER is deprecated, use LABEL maintainer=...")
+            elif keyword == "RUN" and re.search(r"apt-get\s+install", args) and not re.search(r"\s(-y|--yes|--assume-yes)\b", args):
+                warnings.append(f"{at}: apt-get install without -y will wait for input")
+    report = "\n".join(errors + [f"warning: {w}" for w in warnings])
+    return ("FAIL" if errors else "PASS"), report
+
+WORKFLOW_KEYS = {"name", "run-name", "on", "permissions", "env", "defaults", "concurrency", "jobs"}
+
+def check_workflow(project_path, files):
+    """GitHub Actions schema essentials: triggers, jobs with runs-on and steps that each use or run something."""
+    errors = []
+    for name, src in sorted(files.items()):
+        wf = _load_yaml(name, src, errors)
+        if wf is None: continue
+        if not isinstance(wf, dict):
+            errors.append(f"{name}: a workflow must be a mapping")
+            continue
+        # YAML 1.1 reads a bare `on` key as boolean true
+        if True in wf: wf["on"] = wf.pop(True)
+        for key in sorted(set(wf) - WORKFLOW_KEYS, key=str):
+            errors.append(f"{name}: unexpected top-level key {key!r}")
+        if "on" not in wf: errors.append(f"{name}: missing 'on' triggers")
+        jobs = wf.get("jobs")
+        if not isinstance(jobs, dict) or not jobs:
+            errors.append(f"{name}: 'jobs' must be a non-empty mapping")
+            continue
+        for job_id, job in jobs.items():
+            at = f"{name}: job {job_id!r}"
+            if not isinstance(job, dict):
+                errors.append(f"{at} must be a mapping")
+                continue
+            needs = job.get("needs", [])
+            for need in [needs] if isinstance(needs, str) else needs:
+                if need not in jobs: errors.append(f"{at} needs unknown job {need!r}")
+            # A job calling a reusable workflow has neither runs-on nor steps
+            if "uses" in job: continue
+            if "runs-on" not in job: errors.append(f"{at} is missing 'runs-on'")
+            steps = job.get("steps")
+            if not isinstance(steps, list) or not steps:
+                errors.append(f"{at} needs a non-empty 'steps' list")
+                continue
+            for i, step in enumerate(steps):
+                if not isinstance(step, dict) or ("uses" in step) == ("run" in step):
+                    errors.append(f"{at} step {i} must have exactly one of 'uses' or 'run'")
+    return ("FAIL", "\n".join(errors)) if errors else ("PASS", "")
+
+# --- Registry: every validator whose patterns match an artifact runs on each forge ---
+
+class Validator(NamedTuple):
+    tool: str
+    patterns: Tuple[str, ...]
+    check: Callable[[str, Dict[str, str]], Tuple[str, str]]
+    acheck: Optional[Callable] = None
+    timeout: Optional[Callable[[], float]] = None
+
+    def matches(self, path):
+        return any(fnmatch.fnmatch(path, p) for p in self.patterns)
+
+VALIDATORS: List[Validator] = []
+
+def register_validator(tool, patterns, check, acheck=None, timeout=None):
+    """
+    Adds a validator run for artifacts matching any of the fnmatch `patterns`.
+    check(project_path, {path: content}) returns (status, stderr); `acheck` is an
+    optional coroutine twin for the async graph; `timeout` returns seconds and
+    defaults to VALIDATION_TIMEOUT.
+    """
+    VALIDATORS.append(Validator(tool, tuple(patterns), check, acheck, timeout))
+
+register_validator(
+    "Terraform", ["terraform/*"],
+    lambda path, files: CodeValidator().validate_terraform(path),
+    lambda path, files: CodeValidator().avalidate_terraform(path),
+    timeout=lambda: config.terraform_validation_timeout
+)
+register_validator("Ansible", ["ansible/*.yml", "ansible/*.yaml"], check_ansible)
+register_validator("Dockerfile", ["Dockerfile*", "*/Dockerfile*"], check_dockerfile)
+register_validator("GitHub Actions", [".github/workflows/*.yml", ".github/workflows/*.yaml"], check_workflow)
+
+validation_pool = SharedPool("validate", lambda: config.validation_workers)
+
+def _jobs(artifacts, tools):
+    jobs = []
+    for v in VALIDATORS:
+        if tools is not None and v.tool not in tools: continue
+        files = {p: c for p, c in artifacts.items() if v.matches(p)}
+        if files: jobs.append((v, files))
+    return jobs
+
+def _timeout(v):
+    return v.timeout() if v.timeout else config.validation_timeout
+
+class _Start:
+    """Records when a pooled validator job actually begins; its timeout counts from then, not from submission."""
+
+    def __init__(self):
+        self.at = None
+        self._began = threading.Event()
+
+    def __call__(self, at):
+        self.at = at
+        self._began.set()
+
+    def wait(self):
+        self._began.wait()
+        return self.at
+
+def _run(v, project_path, files, on_start=None):
+    started = time.perf_counter()
+    if on_start: on_start(started)
+    try:
+        status, err = v.check(project_path, files)
+    except Exception as e:
+        status, err = "FAIL", str(e)
+    return ValidationResult(tool=v.tool, status=status, stderr=err, duration_s=round(time.perf_counter() - started, 6))
+
+async def _arun(v, project_path, files):
+    started = time.perf_counter()
+    try:
+        status, err = await v.acheck(project_path, files)
+    except Exception as e:
+        status, err = "FAIL", str(e)
+    return ValidationResult(tool=v.tool, status=status, stderr=err, duration_s=round(time.perf_counter() - started, 6))
+
+def _timed_out(v, timeout):
+    logger.warning(f"{v.tool} validation timed out after {timeout}s")
+    return ValidationResult(tool=v.tool, status="FAIL", stderr=f"{v.tool} validation timed out after {timeout}s", duration_s=timeout)
+
+def validate_artifacts(project_path, artifacts, tools=None) -> List[ValidationResult]:
+    """
+    Runs every registered validator (or only `tools`) that has matching artifacts,
+    concurrently on the shared validation pool, in registry order. A validator that
+    overruns its timeout, counted from when it starts running, is reported as FAIL.
+    """
+    pool = validation_pool.get()
+    futures = []
+    for v, files in _jobs(artifacts, tools):
+        start = _Start()
+        futures.append((v, start, pool.submit(_run, v, project_path, files, start)))
+    results = []
+    for v, start, future in futures:
+        timeout = _timeout(v)
+        try:
+            results.append(future.result(timeout=max(0.0, start.wait() + timeout - time.perf_counter())))
+        except FutureTimeout:
+            future.cancel()
+            results.append(_timed_out(v, timeout))
+    return results
+
+async def avalidate_artifacts(project_path, artifacts, tools=None) -> List[ValidationResult]:
+    """Async twin of validate_artifacts: coroutine validators are awaited, the rest use the pool."""
+    loop = asyncio.get_running_loop()
+
+    async def run(v, files):
+        timeout = _timeout(v)
+        if v.acheck is None:
+            began = asyncio.Event()
+            job = loop.run_in_executor(validation_pool.get(), _run, v, project_path, files, lambda at: loop.call_soon_threadsafe(began.set))
+            await began.wait()
+        else: job = _arun(v, project_path, files)
+        try:
+            return await asyncio.wait_for(job, timeout)
+        except asyncio.TimeoutError:
+            return _timed_out(v, timeout)
+
+    return list(await asyncio.gather(*(run(v, files) for v, files in _jobs(artifacts, tools))))
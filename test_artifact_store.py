@@ -0,0 +1,58 @@
+"""
+Content-addressed export store: deduplication, manifests and materialization.
+"""
+import os
+import multiprocessing
+from core.artifact_store import ArtifactStore
+
+
+def test_identical_artifacts_are_stored_once(tmp_path):
+    store = ArtifactStore(str(tmp_path / "store"))
+    common = {"ansible/hardening.yml": "- hosts: all\n" * 50, "README.md": "# Project\n"}
+    store.update("a", {**common, "terraform/main.tf": 'region = "us-east-1"'})
+    store.update("b", {**common, "terraform/main.tf": 'region = "eu-west-1"'})
+
+    assert store.stats()["blobs"] == 4
+    assert store.load("a")["terraform/main.tf"] == 'region = "us-east-1"'
+    assert store.load("b")["README.md"] == "# Project\n"
+
+    store.update("a", {}, changed=["README.md"])
+    assert "README.md" not in store.manifest("a") and "README.md" in store.manifest("b")
+    assert store.gc() == 0
+    os.remove(store._manifest_path("b"))
+    # Unreferenced blobs survive the grace period, which put() restarts when it reuses one
+    assert store.gc() == 0
+    for dirpath, _, files in os.walk(tmp_path / "store" / "blobs"):
+        for name in files: os.utime(os.path.join(dirpath, name), (0, 0))
+    store.put("# Project\n")
+    assert store.gc() == 1
+    assert store.gc(grace=0) == 1
+
+
+def test_materialize_writes_only_what_changed(tmp_path):
+    store = ArtifactStore(str(tmp_path / "store"))
+    dest = tmp_path / "exports" / "a"
+    store.update("a", {"terraform/main.tf": "v1", "terraform/vars.tf": "x", "README.md": "docs"})
+
+    assert store.materialize("a", str(dest), "terraform/") == 2
+    assert not (dest / "README.md").exists()
+    (dest / "terraform" / ".terraform.lock.hcl").write_text("lock")
+
+    store.update("a", {"terraform/main.tf": "v2"}, changed=["terraform/main.tf", "terraform/vars.tf"])
+    assert store.materialize("a", str(dest), "terraform/") == 1
+    assert (dest / "terraform" / "main.tf").read_text() == "v2"
+    assert not (dest / "terraform" / "vars.tf").exists()
+    assert (dest / "terraform" / ".terraform.lock.hcl").exists()
+    assert store.materialize("a", str(dest)) == 1
+    assert (dest / "README.md").read_text() == "docs"
+
+
+def _export(root, i):
+    ArtifactStore(root).update("shared", {f"file{i}.txt": str(i)})
+
+
+def test_concurrent_processes_keep_every_manifest_entry(tmp_path):
+    root = str(tmp_path / "store")
+    with multiprocessing.get_context("fork").Pool(8) as pool:
+        pool.starmap(_export, [(root, i) for i in range(40)])
+    assert len(ArtifactStore(root).manifest("shared")) == 40
@@ -0,0 +1,49 @@
+"""
+Tests for the shared in-memory TTL/LRU cache.
+"""
+from utils.cache import TTLCache, RedisStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_expiry_and_counters():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=4, ttl=10, clock=clock)
+    cache.set("q", "policy")
+    assert cache.get("q") == "policy"
+    clock.now = 11
+    assert cache.get("q") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_lru_eviction():
+    cache = TTLCache(maxsize=2, ttl=None)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_redis_ttls_round_up_to_whole_seconds():
+    class FakeRedis:
+        def __init__(self):
+            self.calls = []
+
+        def setex(self, key, seconds, value):
+            self.calls.append((key, seconds, value))
+
+    store = RedisStore.__new__(RedisStore)
+    store.client, store.prefix = FakeRedis(), "t:"
+    for ttl in (0.2, 1, 1.5, 600):
+        store.set("k", "v", ttl)
+    assert [seconds for _, seconds, _ in store.client.calls] == [1, 1, 2, 600]
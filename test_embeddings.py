@@ -0,0 +1,50 @@
+"""
+Tests for the offline embedder and the disk-backed embedding cache.
+"""
+from core.embeddings import HashingEmbeddings, CachedEmbeddings
+
+
+class CountingEmbeddings(HashingEmbeddings):
+    def __init__(self):
+        super().__init__(dim=16)
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += len(texts)
+        return super().embed_documents(texts)
+
+
+def test_hashing_embeddings_are_deterministic():
+    e = HashingEmbeddings(dim=64)
+    a = e.embed_query("Encrypt all S3 buckets with KMS")
+    b = e.embed_query("Encrypt all S3 buckets with KMS")
+    assert a == b
+    assert len(a) == 64
+    assert abs(sum(v * v for v in a) - 1.0) < 1e-6
+
+
+def test_cache_embeds_identical_chunks_once(tmp_path):
+    inner = CountingEmbeddings()
+    cache = CachedEmbeddings(inner, inner.model_id, str(tmp_path / "cache.sqlite"))
+
+    first = cache.embed_documents(["boilerplate", "policy A", "boilerplate"])
+    assert inner.calls == 2
+    second = cache.embed_documents(["boilerplate", "policy B"])
+    assert inner.calls == 3
+    assert second[0] == first[0]
+    assert cache.stats() == {"hits": 2, "misses": 3}
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    inner = CountingEmbeddings()
+    cache = CachedEmbeddings(inner, inner.model_id, str(tmp_path / "cache.sqlite"), max_entries=2)
+
+    cache.embed_documents(["a"])
+    cache.embed_documents(["b"])
+    cache.embed_documents(["a"])  # refresh "a"
+    cache.embed_documents(["c"])  # evicts "b"
+    calls = inner.calls
+    cache.embed_documents(["a"])
+    assert inner.calls == calls
+    cache.embed_documents(["b"])
+    assert inner.calls == calls + 1
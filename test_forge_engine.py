@@ -0,0 +1,89 @@
+"""
+Template environment caching and rendering in ForgeEngine.
+"""
+import os
+import pytest
+from core.config import config
+from core import forge_engine
+from core.forge_engine import ForgeEngine
+
+
+@pytest.fixture
+def templates(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "template_cache_dir", str(tmp_path / "bytecode"))
+    monkeypatch.setattr(forge_engine, "_environments", {})
+    root = tmp_path / "templates"
+    root.mkdir()
+    (root / "hello.j2").write_text("Hello {{ name }}")
+    return root
+
+
+def test_environment_is_shared_and_reloads_on_mtime_change(templates):
+    engine = ForgeEngine(str(templates))
+    assert ForgeEngine(str(templates)).env is engine.env
+    assert engine.precompile() == 1
+    assert os.listdir(config.template_cache_dir)
+    assert engine.env.get_template("hello.j2").render(name="a") == "Hello a"
+
+    (templates / "hello.j2").write_text("Bye {{ name }}")
+    stat = os.stat(templates / "hello.j2")
+    os.utime(templates / "hello.j2", (stat.st_atime, stat.st_mtime + 5))
+    assert engine.env.get_template("hello.j2").render(name="a") == "Bye a"
+
+
+def test_precompile_logs_broken_templates(templates):
+    (templates / "broken.j2").write_text("{% if %}")
+    assert ForgeEngine(str(templates)).precompile() == 1
+
+
+def make_state(app_enabled):
+    from core.schema import AgentState, InfraBlueprint
+    bp = InfraBlueprint(project_name="demo", region="eu-west-1", app_config={"enabled": app_enabled})
+    return AgentState(thread_id="t", user_idea="demo", current_blueprint=bp)
+
+
+def test_manifest_conditions_and_workflow_escaping(monkeypatch):
+    repo = os.path.dirname(os.path.abspath(__file__))
+    engine = ForgeEngine(os.path.join(repo, "templates"))
+
+    without_app = engine.render_code(make_state(False))
+    with_app = engine.render_code(make_state(True))
+    assert "docker/Dockerfile" not in without_app and "docker/Dockerfile" in with_app
+
+    workflow = with_app[".github/workflows/deploy.yml"]
+    assert "${{ secrets.AWS_ACCESS_KEY_ID }}" in workflow
+    assert "aws-region: eu-west-1" in workflow
+
+    monkeypatch.setattr(config, "render_workers", 4)
+    assert engine.render_code(make_state(True)) == with_app
+
+
+def test_registered_artifacts_render_with_the_manifest(templates, monkeypatch):
+    (templates / "manifest.yml").write_text("artifacts:\n  - path: hello.txt\n    template: hello.j2\n")
+    (templates / "extra.j2").write_text("{{ region }}")
+    monkeypatch.setattr(forge_engine, "ARTIFACTS", [])
+    forge_engine.register_artifact("region.txt", "extra.j2", when="region.startswith('eu')")
+    engine = ForgeEngine(str(templates))
+
+    assert engine.manifest("code", {"region": "eu-west-1"}) == {"hello.txt": "hello.j2", "region.txt": "extra.j2"}
+    assert engine.manifest("code", {"region": "us-east-1"}) == {"hello.txt": "hello.j2"}
+
+
+def test_build_rerenders_only_artifacts_whose_inputs_changed():
+    repo = os.path.dirname(os.path.abspath(__file__))
+    engine = ForgeEngine(os.path.join(repo, "templates"))
+    state = make_state(True)
+    first = engine.build("code", state)
+    assert first.changed == sorted(first.artifacts) and not first.removed
+
+    state.artifacts, state.artifact_fingerprints = first.artifacts, first.fingerprints
+    assert engine.build("code", state).changed == []
+
+    state.current_blueprint = state.current_blueprint.model_copy(update={"vpc_cidr": "10.1.0.0/16"})
+    tweaked = engine.build("code", state)
+    assert tweaked.changed == ["terraform/main.tf"]
+    assert "10.1.0.0/16" in tweaked.artifacts["terraform/main.tf"]
+    assert tweaked.artifacts["ansible/hardening.yml"] == first.artifacts["ansible/hardening.yml"]
+
+    state.current_blueprint = state.current_blueprint.model_copy(update={"app_config": {"enabled": False}})
+    assert engine.build("code", state).removed == ["docker/Dockerfile"]
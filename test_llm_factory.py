@@ -0,0 +1,88 @@
+"""
+Tests for the shared LLM client registry.
+"""
+import os
+import pytest
+from core import llm_factory
+from core.llm_factory import get_llm, pool_stats
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+
+def test_clients_are_shared_per_model_temperature_and_mode():
+    a = get_llm(json_mode=True)
+    assert get_llm(json_mode=True) is a
+    assert get_llm() is not a
+    assert get_llm(temperature=0.7) is not get_llm()
+    assert pool_stats()["clients"] >= 3
+
+
+def test_all_clients_share_one_http_pool():
+    assert get_llm().http_client is get_llm(json_mode=True).http_client is llm_factory._http
+
+
+def test_transport_caps_in_flight_requests():
+    transport = llm_factory.LimitedTransport(max_in_flight=2)
+    assert transport.metrics.snapshot()["max_in_flight"] == 2
+    transport._slots.acquire()
+    transport._slots.acquire()
+    assert not transport._slots.acquire(blocking=False)
+
+
+def test_sync_and_async_requests_share_the_in_flight_cap():
+    import asyncio
+    import httpx
+    transport = llm_factory.LimitedTransport(max_in_flight=1)
+    atransport = llm_factory.LimitedAsyncTransport(1, transport.metrics, transport._slots)
+    transport._slots.acquire()  # a sync request in flight
+
+    async def blocked():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(atransport.handle_async_request(httpx.Request("GET", "http://127.0.0.1:9")), 0.2)
+
+    asyncio.run(blocked())
+    assert transport.metrics.snapshot()["in_flight"] == 0
+    transport._slots.release()
+    assert transport._slots.acquire(blocking=False)
+
+
+def test_response_cache_persists_across_processes(tmp_path):
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration
+    from core.llm_factory import ResponseCache, SQLiteStore
+
+    path = str(tmp_path / "llm.sqlite")
+    first = ResponseCache(SQLiteStore(path))
+    first.update("prompt", "gpt-4-turbo|t=0", [ChatGeneration(message=AIMessage(content='{"project_name": "x"}'))])
+
+    # A fresh process only has the persistent tier
+    second = ResponseCache(SQLiteStore(path))
+    hit = second.lookup("prompt", "gpt-4-turbo|t=0")
+    assert hit[0].message.content == '{"project_name": "x"}'
+    assert second.stats()["persistent_hits"] == 1
+    assert second.lookup("prompt", "gpt-4-turbo|t=0.7") is None
+
+
+def test_cache_can_be_bypassed_per_call():
+    assert get_llm(cache=True).cache is not False
+    assert get_llm(cache=False).cache is False
+    assert get_llm(cache=True) is not get_llm(cache=False)
+
+
+def test_fake_backend_returns_schema_valid_blueprints():
+    import json
+    from core.schema import InfraBlueprint
+    llm = get_llm(json_mode=True, backend="fake")
+    prompt = "Return JSON for this infra idea: api service in eu-west-1 on 10.8.0.0/16. Standards: none"
+    first = llm.invoke(prompt).content
+    assert llm.invoke(prompt).content == first
+    bp = InfraBlueprint(**json.loads(first))
+    assert (bp.region, bp.vpc_cidr, bp.app_config.enabled) == ("eu-west-1", "10.8.0.0/16", True)
+
+
+def test_fake_backend_error_injection():
+    import pytest
+    from core.fake_llm import FakeChatModel, FakeLLMError
+    with pytest.raises(FakeLLMError):
+        FakeChatModel(error_rate=1.0).invoke("hello")
+    assert FakeChatModel(error_rate=0.0).invoke("hello").content
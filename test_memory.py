@@ -0,0 +1,183 @@
+"""
+Tests for the persistent, incrementally re-indexed knowledge base.
+Uses the deterministic hashing embedder so no network is needed.
+"""
+import threading
+from core.memory import CorporateMemory
+from core.embeddings import HashingEmbeddings, CachedEmbeddings
+
+
+def make_memory(tmp_path):
+    inner = HashingEmbeddings(dim=32)
+    embedder = CachedEmbeddings(inner, inner.model_id, str(tmp_path / "emb.sqlite"))
+    return CorporateMemory(persist_dir=str(tmp_path / "chroma"), embedder=embedder)
+
+
+def test_only_changed_files_are_reindexed(tmp_path):
+    kb = tmp_path / "kb"
+    kb.mkdir()
+    (kb / "network.md").write_text("All VPCs must use CIDR 10.20.0.0/16.")
+    (kb / "storage.md").write_text("S3 buckets must be encrypted with KMS.")
+
+    stats = make_memory(tmp_path).initialize(str(kb))
+    assert (stats["added"], stats["changed"], stats["removed"], stats["unchanged"]) == (2, 0, 0, 0)
+    assert stats["ingest"]["files"] == 2
+
+    (kb / "storage.md").write_text("S3 buckets must block public access.")
+    (kb / "network.md").unlink()
+    (kb / "iam.md").write_text("No wildcard IAM policies.")
+
+    mem = make_memory(tmp_path)
+    stats = mem.initialize(str(kb))
+    assert (stats["added"], stats["changed"], stats["removed"], stats["unchanged"]) == (1, 1, 1, 0)
+    assert stats["ingest"]["files"] == 2
+    assert set(mem.manifest) == {"storage.md", "iam.md"}
+
+
+def test_retrieval_cache_is_invalidated_by_index_changes(tmp_path):
+    kb = tmp_path / "kb"
+    kb.mkdir()
+    (kb / "storage.md").write_text("S3 buckets must be encrypted with KMS.")
+    mem = make_memory(tmp_path)
+    mem.initialize(str(kb))
+    version = mem.index_version
+
+    first = mem.retrieve("S3  encryption")
+    assert mem.retrieve("s3 encryption") == first
+    assert mem.retrieval_cache.stats()["hits"] == 1
+
+    (kb / "storage.md").write_text("S3 buckets must block public access.")
+    mem.initialize(str(kb))
+    assert mem.index_version != version
+    assert len(mem.retrieval_cache) == 0
+    assert "public access" in mem.retrieve("s3 encryption")
+
+
+def test_identifier_queries_skip_the_embedder(tmp_path):
+    kb = tmp_path / "kb"
+    kb.mkdir()
+    (kb / "network.md").write_text("Policy NET-007: production VPCs use CIDR 10.20.0.0/16.")
+    (kb / "storage.md").write_text("Policy SEC-042: S3 buckets must be encrypted with KMS.")
+    mem = make_memory(tmp_path)
+    mem.initialize(str(kb))
+
+    calls = []
+    mem.embedder.embed_query = lambda text: calls.append(text)
+    assert mem.retrieve("SEC-042", k=1).startswith("Policy SEC-042")
+    assert "NET-007" in mem.retrieve("10.20.0.0/16", k=1)
+    assert calls == []
+
+
+def test_hybrid_ranking_fuses_lexical_and_vector_hits(tmp_path):
+    kb = tmp_path / "kb"
+    kb.mkdir()
+    (kb / "network.md").write_text("Policy NET-007: production VPCs use CIDR 10.20.0.0/16.")
+    (kb / "storage.md").write_text("Policy SEC-042: S3 buckets must be encrypted with KMS.")
+    mem = make_memory(tmp_path)
+    mem.initialize(str(kb))
+
+    assert "SEC-042" in mem.retrieve("which rules apply to s3 bucket encryption", k=1, mode="hybrid")
+    assert mem.retrieve("kms", k=1, mode="lexical").startswith("Policy SEC-042")
+
+
+def test_parallel_ingest_streams_batches(tmp_path):
+    from core.ingest import ingest
+    kb = tmp_path / "kb"
+    kb.mkdir()
+    jobs = []
+    for n in range(6):
+        (kb / f"std{n}.md").write_text(f"Standard {n}. " + "Encrypt everything. " * 200)
+        jobs.append((f"std{n}.md", str(kb / f"std{n}.md")))
+
+    batches, reports = [], []
+    report = ingest(jobs, batches.append, batch_size=4, workers=2, progress=reports.append)
+    assert report["files"] == 6
+    assert sorted(rel for b in batches for rel, _, _ in b) == sorted(rel for rel, _ in jobs)
+    assert len(batches) > 1
+    assert reports[-1]["chunks"] == report["chunks"] > 0
+
+
+def test_refresh_hot_applies_changes_and_pins_reader_snapshots(tmp_path):
+    kb = tmp_path / "kb"
+    kb.mkdir()
+    (kb / "storage.md").write_text("Policy SEC-042: S3 buckets must be encrypted with KMS.")
+    mem = make_memory(tmp_path)
+    mem.initialize(str(kb))
+    before = mem._snapshot
+
+    (kb / "storage.md").write_text("Policy SEC-042: S3 buckets must block public access.")
+    (kb / "iam.md").write_text("Policy IAM-001: no wildcard actions.")
+    stats = mem.refresh()
+    assert (stats["added"], stats["changed"]) == (1, 1)
+
+    # The old snapshot is untouched and its chunk ids no longer overlap the live ones
+    assert "KMS" in " ".join(before.lexical.texts.values())
+    assert not before.live_ids & mem._snapshot.live_ids
+    assert "public access" in mem.retrieve("SEC-042", k=1)
+    assert "IAM-001" in mem.retrieve("IAM-001", k=1)
+    assert mem.refresh()["unchanged"] == 2
+
+
+def test_warm_up_runs_once_and_reports_its_state(tmp_path, monkeypatch):
+    kb = tmp_path / "kb"
+    kb.mkdir()
+    (kb / "storage.md").write_text("S3 buckets must be encrypted with KMS.")
+    monkeypatch.setattr("core.memory.config.memory_watch", False)
+    mem = make_memory(tmp_path)
+    assert mem.status()["state"] == "cold"
+
+    release, calls = threading.Event(), []
+    initialize = mem.initialize
+    def slow_initialize(path):
+        calls.append(path)
+        release.wait(5)
+        return initialize(path)
+    monkeypatch.setattr(mem, "initialize", slow_initialize)
+
+    thread = mem.warm(str(kb))
+    assert mem.warm(str(kb)) is thread
+    assert mem.status()["state"] == "warming"
+    assert not mem.ensure_ready(timeout=0.05)
+
+    release.set()
+    assert mem.ensure_ready(timeout=5)
+    assert calls == [str(kb)]
+    status = mem.status()
+    assert (status["state"], status["files"], status["error"]) == ("ready", 1, None)
+
+
+def test_failed_warm_up_is_retried(tmp_path, monkeypatch):
+    monkeypatch.setattr("core.memory.config.memory_watch", False)
+    kb = tmp_path / "kb"
+    kb.mkdir()
+    (kb / "iam.md").write_text("No wildcard IAM policies.")
+    mem = make_memory(tmp_path)
+    def broken(path): raise OSError("embedder unavailable")
+    monkeypatch.setattr(mem, "initialize", broken)
+    mem.warm(str(kb), background=False)
+    assert not mem.is_ready
+    assert mem.status()["state"] == "failed"
+    assert mem.status()["error"] == "embedder unavailable"
+
+    monkeypatch.undo()
+    monkeypatch.setattr("core.memory.config.memory_watch", False)
+    mem.warm(str(kb), background=False)
+    assert mem.is_ready and mem.status()["state"] == "ready"
+
+
+def test_emptied_lexical_index_does_not_resurrect_deleted_policies(tmp_path):
+    kb = tmp_path / "kb"
+    kb.mkdir()
+    (kb / "a.md").write_text("Policy SEC-042: S3 buckets must be encrypted with KMS.")
+    mem = make_memory(tmp_path)
+    mem.initialize(str(kb))
+    assert "KMS" in mem.retrieve("SEC-042", k=1)
+
+    (kb / "a.md").unlink()
+    mem.refresh()
+    assert len(mem.lexical) == 0
+    (kb / "b.md").write_text("Policy IAM-001: no wildcard actions.")
+    mem.refresh()
+    assert "KMS" not in mem.retrieve("SEC-042", k=1)
+    assert "KMS" not in mem.retrieve("SEC-042", k=1, mode="lexical")
+    assert "IAM-001" in mem.retrieve("IAM-001", k=1)
@@ -0,0 +1,182 @@
+"""
+Offline runs of the forge graph using the fake LLM backend and hashing embedder.
+"""
+import os
+import pytest
+from core.config import config
+from core.memory import CorporateMemory
+from core.embeddings import HashingEmbeddings, CachedEmbeddings
+from core.schema import AgentState
+import agents.orchestrator as orchestrator
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture
+def offline(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "llm_backend", "fake")
+    monkeypatch.setattr(config, "knowledge_base_path", str(tmp_path / "kb"))
+    inner = HashingEmbeddings(dim=32)
+    mem = CorporateMemory(str(tmp_path / "chroma"), CachedEmbeddings(inner, inner.model_id, str(tmp_path / "e.sqlite")))
+    monkeypatch.setattr(orchestrator, "memory", mem)
+    os.symlink(os.path.join(REPO, "templates"), tmp_path / "templates")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_parallel_and_sequential_graphs_agree(offline):
+    state = AgentState(thread_id="t", user_idea="Web app with a database", image_data="aGVsbG8=")
+    seq = orchestrator.build_workflow(parallel=False).invoke(state)
+    par = orchestrator.build_workflow(parallel=True).invoke(state)
+
+    assert par["user_idea"] == seq["user_idea"]
+    assert "Visual Context" in par["user_idea"]
+    assert par["artifacts"] == seq["artifacts"]
+    assert set(par["artifacts"]) == {
+        "README.md", "ansible/hardening.yml", "docker/Dockerfile", "terraform/main.tf", ".github/workflows/deploy.yml"
+    }
+    assert par["diagram_code"]
+    assert [r.tool for r in par["validation_results"]] == ["Terraform", "Ansible", "Dockerfile", "GitHub Actions"]
+    assert all(r.status == "PASS" for r in par["validation_results"][1:])
+    # Only terraform is materialized; everything else lives in the artifact store
+    project = offline / "exports" / par["current_blueprint"].project_name
+    assert (project / "terraform" / "main.tf").exists() and not (project / "README.md").exists()
+    from core.artifact_store import artifact_store
+    assert artifact_store.load(par["current_blueprint"].project_name) == par["artifacts"]
+
+
+def test_async_graph_matches_sync_and_fans_out(offline):
+    import asyncio
+    state = AgentState(thread_id="t", user_idea="Web app with a database", image_data="aGVsbG8=")
+    seq = orchestrator.build_workflow(parallel=False).invoke(state)
+    ideas = [AgentState(thread_id=f"t{i}", user_idea=f"Service {i} in eu-west-1") for i in range(4)]
+    results = asyncio.run(orchestrator.aforge_many([state] + ideas, concurrency=3))
+
+    assert not any(isinstance(r, Exception) for r in results)
+    assert results[0]["artifacts"] == seq["artifacts"]
+    assert results[0]["validation_results"][0].tool == "Terraform"
+    assert [r["current_blueprint"].region for r in results[1:]] == ["eu-west-1"] * 4
+    strategist = [m for m in results[0]["node_metrics"] if m.node == "strategist"]
+    assert len(strategist) == 1 and strategist[0].tokens_out > 0
+
+
+def test_retry_resumes_from_last_checkpoint(offline, monkeypatch):
+    from core.checkpoints import CheckpointStore
+    store = CheckpointStore(f"sqlite:///{offline / 'checkpoints.sqlite'}")
+    calls = {"strategist": 0, "delivery": 0}
+    strategist, delivery = orchestrator.strategist_node, orchestrator.delivery_node
+
+    def counting_strategist(state):
+        calls["strategist"] += 1
+        return strategist(state)
+
+    def flaky_delivery(state):
+        calls["delivery"] += 1
+        if calls["delivery"] == 1: raise RuntimeError("GitHub unavailable")
+        return delivery(state)
+
+    monkeypatch.setitem(orchestrator.SYNC_NODES, "strategist", counting_strategist)
+    monkeypatch.setitem(orchestrator.SYNC_NODES, "delivery", flaky_delivery)
+    state = AgentState(thread_id="retry", user_idea="Web app with a database")
+
+    with pytest.raises(RuntimeError):
+        orchestrator.run_forge(state, checkpoints=store)
+    assert {"strategist", "forge", "validator", "docs"} <= set(store.completed("retry"))
+
+    final = orchestrator.run_forge(state, checkpoints=store)
+    assert calls == {"strategist": 1, "delivery": 2}
+    assert final["current_blueprint"].project_name
+    assert "terraform/main.tf" in final["artifacts"]
+
+    # A finished run leaves nothing to replay: resubmitting does the work again
+    assert store.completed("retry") == []
+    orchestrator.run_forge(state, checkpoints=store)
+    assert calls == {"strategist": 2, "delivery": 3}
+
+    # A different request under the same thread id starts over
+    with pytest.raises(RuntimeError):
+        calls["delivery"] = 0
+        orchestrator.run_forge(state, checkpoints=store)
+    orchestrator.run_forge(AgentState(thread_id="retry", user_idea="Batch job in eu-west-1"), checkpoints=store)
+    assert calls["strategist"] == 4
+
+
+def test_batch_retrieves_once_per_idea(offline, monkeypatch):
+    import asyncio
+    from core.checkpoints import CheckpointStore
+    store = CheckpointStore(f"sqlite:///{offline / 'checkpoints.sqlite'}")
+    queries = []
+    retrieve = orchestrator.memory.retrieve
+    monkeypatch.setattr(orchestrator.memory, "retrieve", lambda q, *a, **kw: queries.append(q) or retrieve(q, *a, **kw))
+
+    ideas = ["Web app with a database", "Batch job in eu-west-1"] * 3
+    states = [AgentState(thread_id=f"batch:{i}", user_idea=idea) for i, idea in enumerate(ideas)]
+    done = []
+    results = asyncio.run(orchestrator.aforge_batch(states, concurrency=2, on_done=lambda i, r: done.append(i), checkpoints=store))
+
+    assert sorted(queries) == sorted(set(ideas))
+    assert sorted(done) == list(range(6))
+    assert not any(isinstance(r, Exception) for r in results)
+    assert [r["current_blueprint"].region for r in results[1::2]] == ["eu-west-1"] * 3
+    assert not any(store.completed(s.thread_id) for s in states)
+
+    # A failed item is reported, not resumed, so it leaves no checkpoints behind either
+    delivery = orchestrator.ASYNC_NODES["delivery"]
+    async def flaky_delivery(state):
+        if "eu-west-1" in state.user_idea: raise RuntimeError("push rejected")
+        return await delivery(state)
+    monkeypatch.setitem(orchestrator.ASYNC_NODES, "delivery", flaky_delivery)
+    results = asyncio.run(orchestrator.aforge_batch(states[:2], checkpoints=store))
+    assert isinstance(results[1], RuntimeError) and not isinstance(results[0], Exception)
+    assert not any(store.completed(s.thread_id) for s in states[:2])
+
+
+def test_every_node_is_instrumented(offline, monkeypatch):
+    from core.instrumentation import histograms
+    monkeypatch.setattr(config, "instrumentation_sinks", ("histogram",))
+    histograms.clear()
+    state = AgentState(thread_id="t", user_idea="Web app with a database", image_data="aGVsbG8=")
+    final = orchestrator.build_workflow(parallel=True).invoke(state)
+
+    metrics = {m.node: m for m in final["node_metrics"]}
+    assert set(metrics) == {"vision", "context", "strategist", "forge", "validator", "docs", "delivery"}
+    assert metrics["strategist"].tokens_in > 0 and metrics["strategist"].tokens_out > 0
+    assert metrics["vision"].tokens_out > 0
+    assert metrics["forge"].tokens_in == 0 and metrics["forge"].bytes_out > 0
+    assert all(m.wall_s >= 0 and m.cpu_s is not None and m.error is None for m in metrics.values())
+
+    text = histograms.prometheus()
+    assert 'deckforge_node_wall_seconds_count{graph="forge",node="strategist"} 1' in text
+    assert 'deckforge_node_tokens_total{graph="forge",node="strategist",direction="in"}' in text
+
+
+def test_reforge_skips_unchanged_artifacts(offline, monkeypatch):
+    from core.validator import CodeValidator
+    validations = []
+    validate = CodeValidator.validate_terraform
+    monkeypatch.setattr(CodeValidator, "validate_terraform", lambda self, path: validations.append(path) or validate(self, path))
+    graph = orchestrator.build_workflow(parallel=True)
+    first = graph.invoke(AgentState(thread_id="t", user_idea="Web app with a database"))
+    assert sorted(first["changed_artifacts"]) == sorted(first["artifacts"])
+
+    again = AgentState(**{k: v for k, v in first.items() if k != "node_metrics"})
+    second = graph.invoke(again)
+    assert second["changed_artifacts"] == []
+    assert second["artifacts"] == first["artifacts"]
+    assert len(validations) == 1
+    assert second["validation_results"] == first["validation_results"]
+
+
+def test_forges_fall_back_while_the_index_warms(offline, monkeypatch):
+    waits = []
+    def not_ready(timeout=None):
+        waits.append(timeout)
+        return False
+    monkeypatch.setattr(config, "memory_wait_timeout", 0.5)
+    monkeypatch.setattr(orchestrator.memory, "ensure_ready", not_ready)
+    monkeypatch.setattr(orchestrator.memory, "retrieve", lambda idea: pytest.fail("retrieved from a cold index"))
+
+    state = AgentState(thread_id="t", user_idea="Web app")
+    assert orchestrator.context_node(state) == {"retrieved_policy": orchestrator.WARMING_POLICY}
+    assert orchestrator._batch_policies(["a", "b"]) == {"a": orchestrator.WARMING_POLICY, "b": orchestrator.WARMING_POLICY}
+    assert waits == [0.5, 0.5]
@@ -0,0 +1,96 @@
+"""
+StateParser reading terraform.tfstate directly, with `terraform show -json` as the fallback.
+"""
+import json
+import stat
+from core.config import config
+from core.state_parser import StateParser
+
+STATE = {
+    "version": 4, "terraform_version": "1.6.0", "serial": 3, "lineage": "x", "outputs": {},
+    "resources": [
+        {"mode": "managed", "type": "aws_instance", "name": "app", "provider": "provider[\"registry.terraform.io/hashicorp/aws\"]",
+         "instances": [{"index_key": 1, "attributes": {"instance_state": "stopped"}},
+                       {"index_key": 0, "attributes": {"instance_state": "running"}},
+                       {"index_key": 0, "deposed": "abc123", "attributes": {"instance_state": "terminated"}}]},
+        {"module": "module.net.module.subnets[\"a.b\"]", "mode": "managed", "type": "aws_subnet", "name": "this",
+         "instances": [{"attributes": {}}]},
+        {"mode": "data", "type": "aws_ami", "name": "linux", "instances": [{"attributes": {"id": "ami-1"}}]},
+        {"module": "module.app", "mode": "managed", "type": "aws_s3_bucket", "name": "logs",
+         "each": "map", "instances": [{"index_key": "eu", "attributes": {}}]}
+    ]
+}
+
+SHOW = {"format_version": "1.0", "values": {"root_module": {"resources": [
+    {"address": "aws_vpc.main", "type": "aws_vpc", "values": {}}
+]}}}
+
+
+def write_project(root, tfstate=None, main_tf='resource "aws_vpc" "main" {}'):
+    tf = root / "proj" / "terraform"
+    (tf / ".terraform").mkdir(parents=True)
+    (tf / "main.tf").write_text(main_tf)
+    if tfstate is not None: (tf / "terraform.tfstate").write_text(tfstate)
+    return str(root / "proj")
+
+
+def fake_terraform(tmp_path, monkeypatch):
+    log = tmp_path / "calls.log"
+    binary = tmp_path / "terraform"
+    binary.write_text(f"#!/bin/sh\necho \"$1\" >> \"{log}\"\necho '{json.dumps(SHOW)}'\n")
+    binary.chmod(binary.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setattr(config, "terraform_binary", str(binary))
+    return lambda: log.read_text().split() if log.exists() else []
+
+
+def test_reads_state_without_terraform(tmp_path, monkeypatch):
+    calls = fake_terraform(tmp_path, monkeypatch)
+    project = write_project(tmp_path, json.dumps(STATE))
+    assert StateParser(project).get_live_resources() == [
+        {"address": "aws_instance.app[0]", "type": "aws_instance", "status": "running"},
+        {"address": "aws_instance.app[1]", "type": "aws_instance", "status": "stopped"},
+        {"address": "data.aws_ami.linux", "type": "aws_ami", "status": "unknown"},
+        {"address": 'module.app.aws_s3_bucket.logs["eu"]', "type": "aws_s3_bucket", "status": "unknown"},
+        {"address": 'module.net.module.subnets["a.b"].aws_subnet.this', "type": "aws_subnet", "status": "unknown"}
+    ]
+    assert calls() == []
+
+    # A local backend path, or TERRAFORM_STATE_PATH, moves the file
+    moved = write_project(tmp_path / "b", None, 'terraform {\n  backend "local" {\n    path = "state/prod.tfstate"\n  }\n}\n')
+    (tmp_path / "b" / "proj" / "terraform" / "state").mkdir()
+    (tmp_path / "b" / "proj" / "terraform" / "state" / "prod.tfstate").write_text(json.dumps(STATE))
+    assert len(StateParser(moved).get_live_resources()) == 5
+
+    # Other workspaces ignore `path` and live under workspace_dir
+    staged = write_project(tmp_path / "c", None, 'terraform {\n  backend "local" {\n    path = "state/prod.tfstate"\n    workspace_dir = "envs"\n  }\n}\n')
+    (tmp_path / "c" / "proj" / "terraform" / "envs" / "staging").mkdir(parents=True)
+    (tmp_path / "c" / "proj" / "terraform" / "envs" / "staging" / "terraform.tfstate").write_text(json.dumps(STATE))
+    monkeypatch.setenv("TF_WORKSPACE", "staging")
+    assert StateParser(staged).state_path().endswith("/terraform/envs/staging/terraform.tfstate")
+    assert len(StateParser(staged).get_live_resources()) == 5
+    monkeypatch.delenv("TF_WORKSPACE")
+
+    monkeypatch.setattr(config, "terraform_state_path", str(tmp_path / "{project}.tfstate"))
+    (tmp_path / "proj.tfstate").write_text(json.dumps({**STATE, "resources": STATE["resources"][:1]}))
+    assert len(StateParser(project).get_live_resources()) == 2
+    assert calls() == []
+
+
+def test_falls_back_to_terraform_show_for_unreadable_states(tmp_path, monkeypatch):
+    calls = fake_terraform(tmp_path, monkeypatch)
+    legacy = write_project(tmp_path / "a", json.dumps({"version": 3, "modules": []}))
+    remote = write_project(tmp_path / "b", None, 'terraform {\n  backend "s3" {\n    bucket = "tf"\n  }\n}\n')
+    expected = [{"address": "aws_vpc.main", "type": "aws_vpc", "status": "unknown"}]
+    assert StateParser(legacy).get_live_resources() == expected
+    assert StateParser(remote).get_live_resources() == expected
+    assert calls() == ["show", "show"]
+
+    # Any other read error also defers to terraform; a state deleted mid-read is simply empty
+    project = write_project(tmp_path / "c", json.dumps(STATE))
+    def unreadable(self, path): raise PermissionError(path)
+    monkeypatch.setattr(StateParser, "read_state", unreadable)
+    assert StateParser(project).get_live_resources() == expected
+    def deleted(self, path): raise FileNotFoundError(path)
+    monkeypatch.setattr(StateParser, "read_state", deleted)
+    assert StateParser(project).get_live_resources() == []
+    assert calls() == ["show", "show", "show"]
@@ -0,0 +1,340 @@
+"""
+CodeValidator against a stand-in terraform binary that logs its invocations.
+"""
+import os
+import stat
+import asyncio
+import pytest
+from core.config import config
+from core import hcl, validator
+from core.validator import CodeValidator
+from utils.pool import SharedPool
+
+FAKE_TERRAFORM = """#!/bin/sh
+echo "$1" >> "{log}"
+if [ "$1" = "init" ]; then
+  mkdir -p "${{TF_DATA_DIR:-.terraform}}/providers"
+  echo "# lock" > .terraform.lock.hcl
+fi
+if [ "$1" = "validate" ] && grep -q broken main.tf; then
+  echo "Error: Unsupported block type" >&2
+  exit 1
+fi
+exit 0
+"""
+
+
+@pytest.fixture
+def terraform(tmp_path, monkeypatch):
+    log = tmp_path / "calls.log"
+    binary = tmp_path / "terraform"
+    binary.write_text(FAKE_TERRAFORM.format(log=log))
+    binary.chmod(binary.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setattr(config, "terraform_binary", str(binary))
+    monkeypatch.setattr(config, "validation_cache", True)
+    monkeypatch.setattr(config, "validation_cache_backend", "sqlite")
+    monkeypatch.setattr(config, "validation_cache_path", str(tmp_path / "validations.sqlite"))
+    monkeypatch.setattr(config, "terraform_workspace_dir", str(tmp_path / "workspaces"))
+    monkeypatch.setattr(validator, "workspaces", validator.TerraformWorkspaces())
+    monkeypatch.setattr(validator, "_cache", None)
+    monkeypatch.setattr(validator, "_cache_stats", {"hits": 0, "misses": 0})
+    return lambda: log.read_text().split() if log.exists() else []
+
+
+def make_project(root, name, main_tf):
+    tf = root / name / "terraform"
+    tf.mkdir(parents=True)
+    (tf / "main.tf").write_text(main_tf)
+    return str(root / name)
+
+
+def test_identical_terraform_is_validated_once(tmp_path, terraform):
+    first = make_project(tmp_path, "a", 'resource "aws_vpc" "main" {}')
+    second = make_project(tmp_path, "b", 'resource "aws_vpc" "main" {}')
+    assert CodeValidator().validate_terraform(first) == ("PASS", "")
+    assert CodeValidator().validate_terraform(second) == ("PASS", "")
+    assert terraform() == ["init", "validate"]
+
+    broken = make_project(tmp_path, "c", 'resource "aws_vpc" "broken" {}')
+    assert CodeValidator().validate_terraform(broken)[0] == "FAIL"
+    status, err = asyncio.run(CodeValidator().avalidate_terraform(broken))
+    assert status == "FAIL" and "Unsupported block type" in err
+    assert terraform() == ["init", "validate", "init", "validate"]
+    assert validator.validation_cache_stats()["hits"] == 2
+
+
+def test_provider_lock_is_part_of_the_key(tmp_path, terraform):
+    project = make_project(tmp_path, "a", 'resource "aws_vpc" "main" {}')
+    CodeValidator().validate_terraform(project)
+    (tmp_path / "a" / "terraform" / ".terraform.lock.hcl").write_text('provider "aws" { version = "5.1.0" }')
+    os.makedirs(tmp_path / "a" / "terraform" / ".terraform" / "providers", exist_ok=True)
+    CodeValidator().validate_terraform(project)
+    assert terraform().count("validate") == 2
+
+
+PROVIDERS = """terraform {
+  required_providers {
+    aws = { source = "hashicorp/aws", version = "~> 5.0" }
+  }
+}
+"""
+
+
+def test_projects_share_a_preinitialized_workspace(tmp_path, terraform):
+    first = make_project(tmp_path, "a", PROVIDERS + 'resource "aws_vpc" "a" {}')
+    second = make_project(tmp_path, "b", PROVIDERS + 'resource "aws_vpc" "b" {}')
+    assert CodeValidator().validate_terraform(first) == ("PASS", "")
+    assert CodeValidator().validate_terraform(second) == ("PASS", "")
+
+    # One init for the shared workspace, none per project
+    assert terraform() == ["init", "validate", "validate"]
+    for project in (first, second):
+        assert os.path.exists(os.path.join(project, "terraform", ".terraform.lock.hcl"))
+        assert not os.path.exists(os.path.join(project, "terraform", ".terraform"))
+
+
+def test_cached_verdicts_skip_workspace_init(tmp_path, terraform, monkeypatch):
+    CodeValidator().validate_terraform(make_project(tmp_path, "a", PROVIDERS + 'resource "aws_vpc" "a" {}'))
+    assert terraform() == ["init", "validate"]
+
+    # Another host: same shared cache, no workspaces yet
+    monkeypatch.setattr(config, "terraform_workspace_dir", str(tmp_path / "other-host"))
+    monkeypatch.setattr(validator, "workspaces", validator.TerraformWorkspaces())
+    project = make_project(tmp_path, "b", PROVIDERS + 'resource "aws_vpc" "a" {}')
+    assert CodeValidator().validate_terraform(project) == ("PASS", "")
+    assert asyncio.run(CodeValidator().avalidate_terraform(project)) == ("PASS", "")
+    assert terraform() == ["init", "validate"]
+    assert not os.path.exists(tmp_path / "other-host" / "workspaces")
+
+
+def test_projects_with_modules_run_their_own_init(tmp_path, terraform):
+    project = make_project(tmp_path, "a", PROVIDERS + 'module "vpc" { source = "./vpc" }')
+    assert CodeValidator().validate_terraform(project) == ("PASS", "")
+    assert terraform() == ["init", "validate"]
+    assert os.path.exists(os.path.join(project, "terraform", ".terraform"))
+
+
+def test_inits_share_the_plugin_cache_one_at_a_time(tmp_path, terraform, monkeypatch):
+    import threading
+    log = tmp_path / "spans.log"
+    binary = tmp_path / "slow-terraform"
+    binary.write_text(f'#!/bin/sh\nif [ "$1" = "init" ]; then echo start >> "{log}"; sleep 0.2; echo end >> "{log}"; fi\nexit 0\n')
+    binary.chmod(binary.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setattr(config, "terraform_binary", str(binary))
+    monkeypatch.setattr(config, "terraform_precheck", False)
+
+    projects = [make_project(tmp_path, f"m{i}", PROVIDERS + f'module "vpc{i}" {{ source = "./vpc" }}') for i in range(3)]
+    threads = [threading.Thread(target=CodeValidator().validate_terraform, args=(p,)) for p in projects[:2]]
+    for t in threads: t.start()
+    asyncio.run(CodeValidator().avalidate_terraform(projects[2]))
+    for t in threads: t.join()
+    assert log.read_text().split() == ["start", "end"] * 3
+
+
+def test_failed_workspace_init_is_not_retried_every_time(tmp_path, terraform, monkeypatch):
+    binary = tmp_path / "terraform"
+    binary.write_text(binary.read_text().replace('if [ "$1" = "init" ]; then', 'if [ "$1" = "init" ] && [ -n "$TF_DATA_DIR" ]; then exit 1; fi\nif [ "$1" = "init" ]; then'))
+    projects = [make_project(tmp_path, name, PROVIDERS + f'resource "aws_vpc" "{name}" {{}}') for name in "abc"]
+    for project in projects[:2]:
+        assert CodeValidator().validate_terraform(project) == ("PASS", "")
+    # One failed workspace init, then each project initializes on its own
+    assert terraform() == ["init", "init", "validate", "init", "validate"]
+
+    monkeypatch.setattr(config, "terraform_workspace_retry_after", 0)
+    CodeValidator().validate_terraform(projects[2])
+    assert terraform()[5:] == ["init", "init", "validate"]
+
+
+def test_precheck_rejects_without_running_terraform(tmp_path, terraform):
+    unclosed = make_project(tmp_path, "a", 'resource "aws_vpc" "main" {\n  cidr_block = "10.0.0.0/16"\n')
+    status, err = CodeValidator().validate_terraform(unclosed)
+    assert status == "FAIL" and "Unclosed bracket" in err and "line 1" in err
+
+    undeclared = make_project(tmp_path, "b", PROVIDERS + """
+resource "aws_subnet" "public" {
+  vpc_id = aws_vpc.main.id
+  tags   = { Name = "${var.project}-public" }
+}
+""")
+    status, err = asyncio.run(CodeValidator().avalidate_terraform(undeclared))
+    assert status == "FAIL"
+    assert 'A managed resource "aws_vpc" "main" has not been declared' in err
+    assert 'An input variable with the name "project" has not been declared' in err
+    assert terraform() == []
+
+
+def test_precheck_passes_what_terraform_accepts(tmp_path):
+    src = PROVIDERS + """
+variable "subnets" {
+  type = map(string)
+}
+
+locals {
+  name = "app" # trailing comment
+  tags = { Owner = "ops" }
+}
+
+data "aws_ami" "linux" {
+  most_recent = true
+}
+
+resource "aws_subnet" "this" {
+  for_each   = var.subnets
+  cidr_block = each.value
+  tags       = merge(local.tags, { Name = "${local.name}-${each.key}" })
+}
+
+resource "aws_instance" "app" {
+  ami       = data.aws_ami.linux.id
+  subnet_id = [for my_subnet in aws_subnet.this : my_subnet.id][0]
+  user_data = <<-EOF
+    #!/bin/sh
+    echo "$${HOME}" ${local.name}
+  EOF
+
+  dynamic "ebs_block" {
+    for_each = []
+    content { volume_size = ebs_block.value }
+  }
+}
+
+moved {
+  from = aws_instance.old
+  to   = aws_instance.app
+}
+"""
+    tokens = hcl.tokenize(src)
+    assert [t.value for t in tokens[:3]] == ["terraform", "{", "required_providers"]
+    (tmp_path / "main.tf").write_text(src)
+    assert hcl.check_terraform(str(tmp_path)) == []
+
+
+def test_precheck_leaves_what_it_cannot_model_to_terraform(tmp_path):
+    (tmp_path / "main.tf").write_text(PROVIDERS + """
+variable "names" {
+  type = list(string)
+}
+
+locals {
+  banner = <<-EOT
+    %{ for n in var.names ~}
+    ${ n ~}
+    %{~ endfor }
+  EOT
+  joined = "${~ join(",", var.names) ~}"
+}
+""")
+    assert [t.value for t in hcl.tokenize((tmp_path / "main.tf").read_text()) if t.value == "~"] == []
+    assert hcl.check_terraform(str(tmp_path)) == []
+
+    # Unknown syntax or block types are terraform's call, not a precheck FAIL
+    (tmp_path / "main.tf").write_text(PROVIDERS + 'stack "app" {\n  x = 1\n}\n')
+    assert hcl.check_terraform(str(tmp_path)) == []
+    (tmp_path / "main.tf").write_text(PROVIDERS + 'resource "aws_vpc" "main" {\n  x = a @ b\n}\n')
+    assert hcl.check_terraform(str(tmp_path)) == []
+
+
+def test_lint_validators_report_broken_artifacts():
+    status, err = validator.check_ansible(".", {"ansible/site.yml": "- hosts: all\n  tasks:\n    - name: both\n      apt: {name: ufw}\n      service: {name: ssh}\n"})
+    assert status == "FAIL" and "conflicting action statements: apt, service" in err
+
+    status, err = validator.check_dockerfile(".", {"docker/Dockerfile": "# app\nWORKDIR /app\nFROM python\nRUNN make\n"})
+    assert status == "FAIL"
+    assert "first instruction must be FROM" in err and "docker/Dockerfile:4: unknown instruction RUNN" in err
+    assert "warning: docker/Dockerfile:3: pin the base image version (python)" in err
+
+    workflow = "on: push\njobs:\n  test:\n    needs: build\n    steps:\n      - name: nothing\n"
+    status, err = validator.check_workflow(".", {".github/workflows/ci.yml": workflow})
+    assert status == "FAIL"
+    assert "needs unknown job 'build'" in err and "missing 'runs-on'" in err and "exactly one of 'uses' or 'run'" in err
+
+
+def test_validators_run_concurrently_within_their_timeouts(monkeypatch):
+    import time
+    monkeypatch.setattr(validator, "VALIDATORS", [])
+    monkeypatch.setattr(validator, "validation_pool", SharedPool("validate", lambda: 4))
+
+    def sleeper(seconds):
+        return lambda path, files: time.sleep(seconds) or ("PASS", "")
+
+    async def asleeper(path, files):
+        await asyncio.sleep(0.3)
+        return "PASS", ""
+
+    for tool in ("a", "b", "c"): validator.register_validator(tool, [f"{tool}/*"], sleeper(0.3))
+    validator.register_validator("slow", ["slow/*"], sleeper(1), asleeper, timeout=lambda: 0.1)
+    artifacts = {"a/x": "", "b/x": "", "c/x": "", "slow/x": "", "other/x": ""}
+
+    started = time.perf_counter()
+    results = validator.validate_artifacts(".", artifacts)
+    assert time.perf_counter() - started < 0.6
+    assert [(r.tool, r.status) for r in results] == [("a", "PASS"), ("b", "PASS"), ("c", "PASS"), ("slow", "FAIL")]
+    assert all(r.duration_s >= 0.3 for r in results[:3]) and "timed out after 0.1s" in results[3].stderr
+
+    results = asyncio.run(validator.avalidate_artifacts(".", artifacts, tools={"a", "slow"}))
+    assert [(r.tool, r.status) for r in results] == [("a", "PASS"), ("slow", "FAIL")]
+
+
+def test_queue_time_is_not_charged_to_a_validator(monkeypatch):
+    import time
+    # terraform may init a workspace, init and validate, each within TERRAFORM_TIMEOUT
+    terraform = next(v for v in validator.VALIDATORS if v.tool == "Terraform")
+    assert validator._timeout(terraform) == config.terraform_validation_timeout >= 3 * config.terraform_timeout
+
+    monkeypatch.setattr(validator, "VALIDATORS", [])
+    monkeypatch.setattr(validator, "validation_pool", SharedPool("validate", lambda: 1))
+    for tool in ("a", "b"):
+        validator.register_validator(tool, [f"{tool}/*"], lambda path, files: time.sleep(0.3) or ("PASS", ""), timeout=lambda: 0.5)
+    artifacts = {"a/x": "", "b/x": ""}
+
+    assert [r.status for r in validator.validate_artifacts(".", artifacts)] == ["PASS", "PASS"]
+    assert [r.status for r in asyncio.run(validator.avalidate_artifacts(".", artifacts))] == ["PASS", "PASS"]
+
+
+def _alive(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().split(")")[-1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+def test_runner_kills_the_process_group_on_timeout_and_cancel(tmp_path):
+    import time
+    from utils.process import ProcessRunner
+    runner = ProcessRunner("test", max_concurrent=1, timeout=0.3, kill_grace=0.2)
+    pidfile = tmp_path / "child.pid"
+    res = runner.run(["sh", "-c", f"sleep 30 & echo $! > {pidfile}; wait"])
+    assert res.timed_out and res.duration_s < 5
+    child = int(pidfile.read_text())
+    deadline = time.time() + 2
+    while _alive(child) and time.time() < deadline: time.sleep(0.05)
+    assert not _alive(child)
+
+    async def cancelled():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(runner.arun(["sleep", "30"], timeout=60), 0.2)
+
+    asyncio.run(cancelled())
+    stats = runner.metrics.snapshot()
+    assert stats["timeouts"] == 1 and stats["cancelled"] == 1 and stats["in_flight"] == 0
+
+
+def test_runner_caps_concurrency_and_applies_rlimits():
+    import sys
+    import threading
+    from utils.process import ProcessRunner
+    runner = ProcessRunner("test", max_concurrent=1)
+    threads = [threading.Thread(target=runner.run, args=(["sleep", "0.2"],)) for _ in range(2)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    stats = runner.metrics.snapshot()
+    assert stats["peak_in_flight"] == 1 and stats["waited"] == 1 and stats["max_wait_seconds"] >= 0.1
+    assert 'deckforge_subprocess_queue_waits_total{command="test"} 1' in runner.metrics.prometheus()
+
+    limited = ProcessRunner("test", memory_mb=200)
+    assert limited.run([sys.executable, "-c", "bytearray(400 * 1024 * 1024)"]).returncode != 0
+    assert limited.run([sys.executable, "-c", "bytearray(10 * 1024 * 1024)"]).returncode == 0
+    cpu = ProcessRunner("test", cpu_seconds=7)
+    limits = asyncio.run(cpu.arun(["sh", "-c", "sleep 0.1; cat /proc/$$/limits"])).stdout
+    assert [line.split()[3:5] for line in limits.splitlines() if line.startswith("Max cpu time")] == [["7", "12"]]
@@ -0,0 +1,125 @@
+import os
+import math
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """Thread-safe in-memory LRU cache with per-entry time-to-live."""
+
+    def __init__(self, maxsize: int = 256, ttl: Optional[float] = 600,
+                 clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value, or `default` when missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and (entry[0] is None or entry[0] > self.clock()):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store `value`, evicting the least recently used entry when full."""
+        if self.maxsize <= 0:
+            return
+        expires = self.clock() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current size."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._data),
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class SQLiteStore:
+    """Persistent string key-value store with per-entry TTL, shared by all processes on one host."""
+
+    def __init__(self, path: str, table: str = "responses"):
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _db(self):
+        # Connections must not cross a fork
+        if self._conn is None or self._pid != os.getpid():
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS {self.table} (key TEXT PRIMARY KEY, value TEXT, expires REAL)")
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db().execute(f"SELECT value, expires FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return row[0]
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        with self._lock:
+            db = self._db()
+            db.execute(f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?)", (key, value, time.time() + ttl))
+            db.execute(f"DELETE FROM {self.table} WHERE expires < ?", (time.time(),))
+            db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            db = self._db()
+            db.execute(f"DELETE FROM {self.table}")
+            db.commit()
+
+
+class RedisStore:
+    """Persistent string key-value store with per-entry TTL, shared by all workers through Redis."""
+
+    def __init__(self, url: str, prefix: str = "deckforge:"):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(self.prefix + key)
+        return value.decode() if value is not None else None
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        # SETEX takes whole seconds and rejects 0; round sub-second TTLs up
+        self.client.setex(self.prefix + key, max(1, math.ceil(ttl)), value)
+
+    def clear(self) -> None:
+        for k in self.client.scan_iter(self.prefix + "*"):
+            self.client.delete(k)
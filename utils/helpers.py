@@ -1,27 +1,35 @@
 import os
 import json
 import base64
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterable, Optional
 from pathlib import Path
 
 
-def save_artifacts_to_disk(artifacts: Dict[str, str], project_path: str) -> None:
+def save_artifacts_to_disk(artifacts: Dict[str, str], project_path: str, changed: Optional[Iterable[str]] = None) -> None:
     """
     Save generated artifacts to disk in the specified project path.
     
     Args:
         artifacts: Dictionary mapping file paths to their content
         project_path: Base directory to save artifacts in
+        changed: If given, only these paths (plus any missing on disk) are written,
+            and those no longer in `artifacts` are deleted
     """
     project_dir = Path(project_path)
     project_dir.mkdir(parents=True, exist_ok=True)
+    changed = set(changed) if changed is not None else None
     
     for file_path, content in artifacts.items():
         full_path = project_dir / file_path
+        if changed is not None and file_path not in changed and full_path.exists():
+            continue
         full_path.parent.mkdir(parents=True, exist_ok=True)
         
         with open(full_path, 'w', encoding='utf-8') as f:
             f.write(content)
+    
+    for file_path in (changed or set()) - set(artifacts):
+        (project_dir / file_path).unlink(missing_ok=True)
 
 
 def load_json_file(file_path: str) -> Optional[Dict[str, Any]]:
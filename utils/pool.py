@@ -0,0 +1,29 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+
+class SharedPool:
+    """
+    A thread pool shared by everything in a process, created on first use.
+
+    Args:
+        name: Thread name prefix.
+        size: Returns the number of worker threads; read when the pool is created.
+    """
+
+    def __init__(self, name: str, size: Callable[[], int]):
+        self.name = name
+        self.size = size
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get(self) -> ThreadPoolExecutor:
+        # Worker threads do not survive a fork, so a child process builds its own pool
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = ThreadPoolExecutor(max_workers=self.size(), thread_name_prefix=self.name)
+                self._pid = os.getpid()
+            return self._pool
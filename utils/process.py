@@ -0,0 +1,227 @@
+import os
+import time
+import signal
+import asyncio
+import subprocess
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SIGKILL = getattr(signal, "SIGKILL", signal.SIGTERM)
+
+
+class ProcessResult(NamedTuple):
+    returncode: int
+    stdout: str
+    stderr: str
+    timed_out: bool = False
+    duration_s: float = 0.0
+    queued_s: float = 0.0
+
+
+class RunnerMetrics:
+    """Counters for one ProcessRunner: runs, timeouts, concurrency and queue wait."""
+
+    def __init__(self, name: str, max_concurrent: int):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.runs = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.waited = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.run_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def started(self, wait: float) -> None:
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            self.wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+            if wait > 0.001:
+                self.waited += 1
+
+    def finished(self, duration: float, returncode: Optional[int], timed_out: bool = False, cancelled: bool = False) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self.runs += 1
+            self.run_seconds += duration
+            self.timeouts += timed_out
+            self.cancelled += cancelled
+            self.failures += bool(returncode) and not (timed_out or cancelled)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "runs": self.runs,
+                "failures": self.failures,
+                "timeouts": self.timeouts,
+                "cancelled": self.cancelled,
+                "waited": self.waited,
+                "wait_seconds_total": round(self.wait_seconds, 3),
+                "max_wait_seconds": round(self.max_wait_seconds, 3),
+                "run_seconds_total": round(self.run_seconds, 3),
+            }
+
+    def prometheus(self) -> str:
+        s = self.snapshot()
+        label = f'command="{self.name}"'
+        series = [
+            ("deckforge_subprocess_runs_total", "counter", "Finished subprocess runs", s["runs"]),
+            ("deckforge_subprocess_failures_total", "counter", "Runs that exited non-zero", s["failures"]),
+            ("deckforge_subprocess_timeouts_total", "counter", "Runs killed at their wall-clock timeout", s["timeouts"]),
+            ("deckforge_subprocess_cancelled_total", "counter", "Runs killed because the caller was cancelled", s["cancelled"]),
+            ("deckforge_subprocess_run_seconds_total", "counter", "Wall time spent in subprocesses", s["run_seconds_total"]),
+            ("deckforge_subprocess_queue_waits_total", "counter", "Runs that waited for a concurrency slot", s["waited"]),
+            ("deckforge_subprocess_queue_wait_seconds_total", "counter", "Time spent waiting for a concurrency slot", s["wait_seconds_total"]),
+            ("deckforge_subprocess_in_flight", "gauge", "Subprocesses currently running", s["in_flight"]),
+        ]
+        lines = []
+        for name, kind, help_text, value in series:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name}{{{label}}} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+class ProcessRunner:
+    """
+    Runs external commands with a concurrency cap, a wall-clock timeout and per-process
+    CPU/memory rlimits. Each command gets its own process group, so a timeout or a
+    cancelled caller kills the command and every child it spawned (terraform providers).
+
+    Args:
+        name: Label used in metrics and logs.
+        max_concurrent: Commands allowed to run at once across threads and event loops.
+        timeout: Default wall-clock limit in seconds; None waits forever.
+        cpu_seconds: RLIMIT_CPU per process; 0 disables it. Limits are set with prlimit
+            just after spawn (Linux), so children forked before that do not inherit them.
+        memory_mb: RLIMIT_AS per process in MiB; 0 disables it.
+        kill_grace: Seconds between SIGTERM and SIGKILL.
+    """
+
+    def __init__(self, name: str, max_concurrent: int = 4, timeout: Optional[float] = None,
+                 cpu_seconds: int = 0, memory_mb: int = 0, kill_grace: float = 2.0):
+        self.name = name
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.kill_grace = kill_grace
+        self.metrics = RunnerMetrics(name, max_concurrent)
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+
+    def _limit(self, proc) -> None:
+        # Applied from the parent right after spawn: preexec_fn is not safe once the process has threads
+        if not (self.cpu_seconds or self.memory_mb) or not hasattr(resource, "prlimit"):
+            return
+        try:
+            if self.cpu_seconds:
+                resource.prlimit(proc.pid, resource.RLIMIT_CPU, (self.cpu_seconds, self.cpu_seconds + 5))  # SIGXCPU first, SIGKILL 5s later
+            if self.memory_mb:
+                memory = self.memory_mb * 1024 * 1024
+                resource.prlimit(proc.pid, resource.RLIMIT_AS, (memory, memory))
+        except (ProcessLookupError, PermissionError):
+            pass  # Already exited
+
+    def _kwargs(self, cwd, env):
+        kwargs = {"cwd": cwd, "env": env, "stdout": subprocess.PIPE, "stderr": subprocess.PIPE}
+        if os.name == "posix":
+            kwargs["start_new_session"] = True
+        return kwargs
+
+    @staticmethod
+    def _signal(proc, sig) -> None:
+        try:
+            if os.name == "posix":
+                os.killpg(proc.pid, sig)
+            else:
+                proc.kill()
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def run(self, args: List[str], cwd: Optional[str] = None, env: Optional[Dict[str, str]] = None,
+            timeout: Optional[float] = None) -> ProcessResult:
+        """Run `args` to completion or until `timeout` (default: the runner's), then kill its process group."""
+        timeout = self.timeout if timeout is None else timeout
+        queued = time.perf_counter()
+        self._slots.acquire()
+        started = time.perf_counter()
+        self.metrics.started(started - queued)
+        proc, timed_out = None, False
+        try:
+            proc = subprocess.Popen(args, **self._kwargs(cwd, env))
+            self._limit(proc)
+            try:
+                stdout, stderr = proc.communicate(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                timed_out = True
+                self._signal(proc, signal.SIGTERM)
+                try:
+                    stdout, stderr = proc.communicate(timeout=self.kill_grace)
+                except subprocess.TimeoutExpired:
+                    self._signal(proc, SIGKILL)
+                    stdout, stderr = proc.communicate()
+            return ProcessResult(
+                proc.returncode, stdout.decode(errors="replace"), stderr.decode(errors="replace"),
+                timed_out, round(time.perf_counter() - started, 6), round(started - queued, 6)
+            )
+        finally:
+            self.metrics.finished(time.perf_counter() - started, proc.returncode if proc else None, timed_out)
+            self._slots.release()
+
+    async def _acquire(self) -> None:
+        # One semaphore for threads and every event loop; polling keeps cancellation clean
+        delay = 0.005
+        while not self._slots.acquire(blocking=False):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.1)
+
+    async def _terminate(self, proc) -> None:
+        self._signal(proc, signal.SIGTERM)
+        try:
+            await asyncio.wait_for(proc.wait(), self.kill_grace)
+        except asyncio.TimeoutError:
+            self._signal(proc, SIGKILL)
+            await proc.wait()
+
+    async def arun(self, args: List[str], cwd: Optional[str] = None, env: Optional[Dict[str, str]] = None,
+                   timeout: Optional[float] = None) -> ProcessResult:
+        """Async twin of run(); cancelling the awaiting task also kills the process group."""
+        timeout = self.timeout if timeout is None else timeout
+        queued = time.perf_counter()
+        await self._acquire()
+        started = time.perf_counter()
+        self.metrics.started(started - queued)
+        proc, timed_out, cancelled = None, False, False
+        try:
+            proc = await asyncio.create_subprocess_exec(*args, **self._kwargs(cwd, env))
+            self._limit(proc)
+            communicate = asyncio.ensure_future(proc.communicate())
+            try:
+                stdout, stderr = await asyncio.wait_for(asyncio.shield(communicate), timeout)
+            except asyncio.TimeoutError:
+                timed_out = True
+                await self._terminate(proc)
+                stdout, stderr = await communicate
+            return ProcessResult(
+                proc.returncode, stdout.decode(errors="replace"), stderr.decode(errors="replace"),
+                timed_out, round(time.perf_counter() - started, 6), round(started - queued, 6)
+            )
+        except asyncio.CancelledError:
+            cancelled = True
+            if proc is not None and proc.returncode is None:
+                await asyncio.shield(self._terminate(proc))
+            raise
+        finally:
+            self.metrics.finished(time.perf_counter() - started, proc.returncode if proc else None, timed_out, cancelled)
+            self._slots.release()
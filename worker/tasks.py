@@ -1,17 +1,33 @@
 import os
+import asyncio
 from celery import Celery
+from celery.signals import worker_process_init
 from core.database import SessionLocal
 from core.models import Project, TrainingData, Incident, IncidentStatus
 from core.state_parser import StateParser
 # Import your Phase 1-4 Logic
-from agents.orchestrator import brain
+from agents.orchestrator import run_forge, aforge_batch, export_path
 from core.schema import AgentState
+from core.config import config
+from core.memory import memory
 import ansible_runner
 
 REDIS_URL = os.getenv("REDIS_URL")
 celery_app = Celery("deckforge", broker=REDIS_URL, backend=REDIS_URL)
 
-@celery_app.task(bind=True)
+@worker_process_init.connect
+def warm_memory(**kwargs):
+    """Index in the background per child so the pool accepts tasks immediately."""
+    memory.warm()
+
+def _exported(final_state):
+    """Where the forge exported its artifacts; the CAS store keeps the full set under the project name."""
+    project = final_state["current_blueprint"].project_name
+    location = {"path": os.path.abspath(export_path(project))}
+    if config.export_store == "cas": location["cas_project"] = project
+    return location
+
+@celery_app.task(bind=True, max_retries=3)
 def forge_infrastructure(self, project_id: str, idea: str, thread_id: str):
     """
     Phase 7: Long-running generation task.
@@ -19,20 +35,51 @@ def forge_infrastructure(self, project_id: str, idea: str, thread_id: str):
     # 1. Init State
     state = AgentState(thread_id=thread_id, user_idea=idea)
     
-    # 2. Run LangGraph
-    final_state = brain.invoke(state)
-    
-    # 3. Save Artifacts to Disk (Shared Volume)
-    export_path = f"/app/exports/{project_id}"
-    os.makedirs(export_path, exist_ok=True)
-    # ... logic to write state.artifacts to export_path ...
+    # 2. Run LangGraph; a retry resumes after the last checkpointed node
+    try:
+        final_state = run_forge(state)
+    except Exception as e:
+        raise self.retry(exc=e, countdown=2 ** self.request.retries)
     
+    # 3. The graph already exported the artifacts (Shared Volume); report where
     return {
         "status": "COMPLETED",
         "artifacts": final_state['artifacts'],
-        "path": export_path
+        **_exported(final_state)
     }
 
+@celery_app.task(bind=True)
+def forge_batch(self, items: list):
+    """
+    Phase 7: Bulk generation. One task drives the whole batch on an event loop and
+    publishes per-item progress in its PROGRESS meta; the task id is the group id.
+    """
+    # Distinct from every other batch and from single forges
+    states = [AgentState(thread_id=f"batch:{self.request.id}:{it['project_id']}", user_idea=it["idea"]) for it in items]
+    progress = {
+        "total": len(items), "completed": 0, "failed": 0,
+        "items": {it["project_id"]: {"status": "PENDING"} for it in items}
+    }
+
+    def on_done(i, result):
+        project_id = items[i]["project_id"]
+        if isinstance(result, Exception):
+            progress["failed"] += 1
+            progress["items"][project_id] = {"status": "FAILED", "error": str(result)}
+        else:
+            progress["completed"] += 1
+            progress["items"][project_id] = {
+                "status": "COMPLETED",
+                **_exported(result),
+                "artifacts": sorted(result["artifacts"]),
+                "validation": [r.status for r in result["validation_results"]]
+            }
+        self.update_state(state="PROGRESS", meta=progress)
+
+    self.update_state(state="PROGRESS", meta=progress)
+    asyncio.run(aforge_batch(states, on_done=on_done))
+    return {"status": "COMPLETED", **progress}
+
 @celery_app.task
 def detect_drift(project_id: str):
     """